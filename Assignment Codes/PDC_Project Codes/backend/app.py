@@ -1,30 +1,115 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import tensorflow as tf
 import numpy as np
-from PIL import Image
-import io
 import json
 import os
+import threading
+import time
+from collections import deque
+from batch_uploads import chunked, iter_uploads, keep_uploads, read_ahead
+from micro_batcher import MicroBatcher
+from image_pipeline import IMAGE_SIZE, decode_image, decode_image_timed, make_pool, normalize_into, preprocess_batch
+from prediction_cache import PredictionCache
+from process_stats import StartupTimer
+from request_metrics import RequestMetrics
+from top_k import parse_top_k, top_k_predictions
 
 app = Flask(__name__)
 # Allow CORS for all domains (simplify for development)
-CORS(app)
+CORS(app, expose_headers=["X-Request-ID", "Server-Timing"])
+
+# Per-stage latency histograms (/metrics); requests slower than SLOW_REQUEST_MS
+# are logged with their request id and stage breakdown
+metrics = RequestMetrics("backend", slow_ms=float(os.environ.get("SLOW_REQUEST_MS", "1000")))
+app.before_request(metrics.before_request)
+app.after_request(metrics.after_request)
 
 # Global variables
 model = None
 labels_map = None
+label_table = None
+batcher = None
+preprocess_pool = None
+cache = None
+lite_model = None
+runtime_info = {"runtime": "keras"}
+loaded_pid = None
+startup = StartupTimer()
+
+
+# Micro-batching: concurrent requests share one model call
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "16"))
+MAX_WAIT_MS = float(os.environ.get("MAX_WAIT_MS", "5"))
+
+# Preprocessing: decode/resize runs on a pool so it overlaps with inference
+PREPROCESS_POOL = os.environ.get("PREPROCESS_POOL", "thread")  # "thread" or "process"
+PREPROCESS_WORKERS = int(os.environ.get("PREPROCESS_WORKERS", "4"))
+# JPEG draft decoding straight to ~224px (set FAST_DECODE=0 for full-resolution decode)
+FAST_DECODE = os.environ.get("FAST_DECODE", "1") != "0"
+
+# Prediction cache keyed by a hash of the uploaded bytes (CACHE_SIZE=0 disables it)
+CACHE_SIZE = int(os.environ.get("CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.environ.get("CACHE_TTL", "3600"))
+CACHE_DIR = os.environ.get("CACHE_DIR")  # optional on-disk tier
+
+# /predict/batch: chunks of MAX_BATCH_SIZE images, at most BATCH_IN_FLIGHT chunks
+# waiting on the model, so memory does not grow with the archive size
+BATCH_IN_FLIGHT = int(os.environ.get("BATCH_IN_FLIGHT", "2"))
+MAX_IMAGE_BYTES = int(float(os.environ.get("MAX_IMAGE_MB", "32")) * 1024 * 1024)
+
+# Inference runtime: "keras" or "tflite" (XNNPACK, optional quantization)
+RUNTIME = os.environ.get("RUNTIME", "keras")
+TFLITE_QUANT = os.environ.get("TFLITE_QUANT", "none")  # none, dynamic, fp16, int8
+TFLITE_THREADS = int(os.environ.get("TFLITE_THREADS", str(os.cpu_count() or 1)))
+TFLITE_SAMPLES_DIR = os.environ.get("TFLITE_SAMPLES_DIR")  # images for int8 calibration + drift check
+TFLITE_MIN_AGREEMENT = float(os.environ.get("TFLITE_MIN_AGREEMENT", "0.98"))
+
+def run_model(batch):
+    if lite_model is not None:
+        return lite_model(batch)
+    # Direct call skips model.predict's per-call setup
+    return model(batch, training=False).numpy()
+
+def load_lite_runtime(model_path):
+    """Switch run_model to TFLite; stays on Keras if conversion or the drift check fails"""
+    global lite_model, runtime_info
+    from lite_runtime import load_tflite
+    try:
+        lite_model, report = load_tflite(model, model_path, TFLITE_QUANT, TFLITE_THREADS,
+                                          TFLITE_SAMPLES_DIR, TFLITE_MIN_AGREEMENT)
+        runtime_info = {"runtime": "tflite", "quantization": TFLITE_QUANT,
+                        "threads": TFLITE_THREADS, "drift": report}
+    except Exception as e:
+        print(f"TFLite runtime not used, serving with Keras. Details: {e}")
 
 def load_model_resources():
-    global model, labels_map
+    """
+    Model, labels and cache. Under gunicorn with preload_app this runs once in
+    the master and the workers share the result through fork.
+    """
+    global model, labels_map, label_table, cache, loaded_pid
+    loaded_pid = os.getpid()
     
     # 1. Load Model
     print("Loading Keras model...")
     # Ensure this path matches where you put the file on your server
     model_path = os.path.join("..", "model", "best_model.keras") 
     try:
+        # Imported here rather than at the top: importing the app (gunicorn
+        # master, liveness checks) doesn't wait for TensorFlow
+        import tensorflow as tf
+        startup.mark("import_tensorflow")
         model = tf.keras.models.load_model(model_path)
+        startup.mark("load_model")
         print("Model loaded successfully")
+        if RUNTIME == "tflite":
+            load_lite_runtime(model_path)
+            startup.mark("tflite")
+        if CACHE_SIZE > 0:
+            # A different model file or decode mode never reuses old disk entries
+            namespace = (f"{os.path.abspath(model_path)}:{os.path.getmtime(model_path)}:{FAST_DECODE}:"
+                         f"{runtime_info['runtime']}:{TFLITE_QUANT}")
+            cache = PredictionCache(CACHE_SIZE, CACHE_TTL, CACHE_DIR, namespace)
     except Exception as e:
         print(f"CRITICAL ERROR: Could not load model at {model_path}. Details: {e}")
 
@@ -38,85 +123,300 @@ def load_model_resources():
         print(f"Loaded {len(labels_map)} labels from json.")
     except Exception as e:
         print(f"CRITICAL ERROR: Could not load labels.json. Details: {e}")
+        return
+
+    # 3. Response label table, indexed by class id (built once, not per request)
+    num_classes = max(labels_map) + 1 if labels_map else 0
+    if model is not None:
+        num_classes = max(num_classes, model.output_shape[-1])
+    label_table = []
+    for idx in range(num_classes):
+        # Default to "Unknown" if index missing
+        label_info = labels_map.get(idx, {"plant": "Unknown", "disease": "Unknown"})
+        label_table.append({
+            "plant": label_info.get("plant"),
+            "disease": label_info.get("disease"),
+            "healthy": label_info.get("healthy", False)
+        })
+
+def start_worker():
+    """
+    Per-process serving state, run in the process that answers requests
+    (each gunicorn worker after fork, or python app.py). Threads don't
+    survive fork, so the micro-batcher, the preprocessing pool and the
+    TFLite interpreter are created here. One warm-up inference then pays
+    kernel setup / tracing before the first real request does.
+    """
+    global batcher, preprocess_pool, lite_model
+    startup.restart()
+    if model is None or label_table is None:
+        print("Not serving predictions: model or labels failed to load")
+        return
 
-# Load resources immediately on startup
-load_model_resources()
+    if lite_model is not None and os.getpid() != loaded_pid:
+        lite_model = lite_model.clone()
+    preprocess_pool = make_pool(PREPROCESS_POOL, PREPROCESS_WORKERS)
+    batcher = MicroBatcher(run_model, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS)
+    print(f"Micro-batching: up to {MAX_BATCH_SIZE} images, {MAX_WAIT_MS} ms max wait")
+
+    try:
+        run_model(np.zeros((1,) + IMAGE_SIZE + (3,), dtype=np.float32))
+    except Exception as e:
+        print(f"CRITICAL ERROR: Warm-up inference failed. Details: {e}")
+        return
+    startup.mark("warmup")
+    startup.ready = True
+    print(f"Worker ready: {startup.summary()}")
 
 def preprocess_image(image_bytes):
     """
     Prepares an image for the model.
     CRITICAL: Must match training preprocessing exactly.
     """
-    # 1. Open image
-    img = Image.open(io.BytesIO(image_bytes))
-    
-    # 2. Ensure RGB (removes Alpha channel if PNG, converts Grayscale if B&W)
-    if img.mode != "RGB":
-        img = img.convert("RGB")
-    
-    # 3. Resize to model input size (224x224)
-    img = img.resize((224, 224))
-    
-    # 4. Convert to Array
-    img_array = np.array(img)
-    
-    # 5. Normalize (0-255 -> 0-1)
+    # 1. Preallocate the (1, 224, 224, 3) batch the model receives
+    img_array = np.empty((1,) + IMAGE_SIZE + (3,), dtype=np.float32)
+
+    # 2. Decode (draft mode for JPEG), convert to RGB, resize to 224x224
+    pixels = decode_image(image_bytes, fast=FAST_DECODE)
+
+    # 3. Normalize (0-255 -> 0-1) straight into the batch buffer
     # THIS WAS THE KEY FIX: Training used / 255.0, so this must match.
-    img_array = img_array.astype('float32') / 255.0
-    
-    # 6. Add Batch Dimension (224, 224, 3) -> (1, 224, 224, 3)
-    img_array = np.expand_dims(img_array, axis=0)
-    
+    normalize_into(pixels, img_array[0])
+
     return img_array
 
+def predict_images(images):
+    """
+    Upload bytes -> (n, num_classes) probabilities.
+    Cached images skip decode and inference; the rest are decoded in
+    parallel into one float32 batch and scored through the micro-batcher
+    (model calls of at most MAX_BATCH_SIZE images).
+    """
+    probs = [None] * len(images)
+    keys = []
+    if cache is not None:
+        with metrics.stage("cache"):
+            keys = [cache.key(image_bytes) for image_bytes in images]
+            probs = [cache.get(key) for key in keys]
+
+    missing = [i for i, p in enumerate(probs) if p is None]
+    if missing:
+        tensor = preprocess_batch(preprocess_pool, [images[i] for i in missing], fast=FAST_DECODE,
+                                  observe=metrics.observe)
+        # Predict (queued; runs stacked with other concurrent requests)
+        with metrics.stage("inference"):
+            fresh = batcher.predict(tensor)
+        for i, row in zip(missing, fresh):
+            probs[i] = row
+            if cache is not None:
+                cache.put(keys[i], row)
+
+    return np.stack(probs)
+
+def decode_uploads(uploads):
+    """
+    (name, bytes, error) -> (name, cache key, cached probs, decode future, error).
+    The decode is submitted to the pool as soon as the item is pulled;
+    cache hits are not decoded at all.
+    """
+    for name, image_bytes, error in uploads:
+        key = probs = future = None
+        if error is None:
+            if cache is not None:
+                with metrics.stage("cache"):
+                    key = cache.key(image_bytes)
+                    probs = cache.get(key)
+            if probs is None:
+                future = preprocess_pool.submit(decode_image_timed, image_bytes, IMAGE_SIZE, FAST_DECODE)
+        yield name, key, probs, future, error
+
+def submit_chunk(chunk):
+    """Wait for a chunk's decodes, queue the misses on the micro-batcher (not waited for)"""
+    rows = []
+    pixels = []
+    for name, key, probs, future, error in chunk:
+        if future is not None:
+            try:
+                image, decode_s, resize_s = future.result()
+                pixels.append(image)
+                metrics.observe("decode", decode_s)
+                metrics.observe("resize", resize_s)
+            except Exception as e:
+                error = f"Could not decode image: {e}"
+        rows.append([name, key, probs, error])
+
+    missing = [i for i, (_, _, probs, error) in enumerate(rows) if probs is None and error is None]
+    inference = None
+    if missing:
+        batch = np.empty((len(missing),) + IMAGE_SIZE + (3,), dtype=np.float32)
+        for out, image in zip(batch, pixels):
+            normalize_into(image, out)
+        submitted = time.perf_counter()
+        inference = batcher.submit(batch)
+        # Timed to completion, not to when the stream gets round to reading it
+        inference.add_done_callback(lambda _: metrics.observe("inference", time.perf_counter() - submitted))
+    return rows, missing, inference
+
+def chunk_results(rows, missing, inference, k):
+    """One result dict per image of the chunk, in upload order"""
+    if inference is not None:
+        try:
+            fresh = inference.result()
+        except Exception as e:
+            for i in missing:
+                rows[i][3] = f"Inference failed: {e}"
+        else:
+            for i, row in zip(missing, fresh):
+                rows[i][2] = row
+                if cache is not None:
+                    cache.put(rows[i][1], row)
+
+    scored = [row for row in rows if row[3] is None]
+    with metrics.stage("postprocess"):
+        top = top_k_predictions(np.stack([row[2] for row in scored]), k, label_table) if scored else []
+    top = iter(top)
+    for name, _, _, error in rows:
+        if error is None:
+            yield {"filename": name, "predictions": next(top)}
+        else:
+            yield {"filename": name, "error": error}
+
+def stream_batch_predictions(uploads, k):
+    """
+    Pipeline behind /predict/batch, one NDJSON line per image:
+    the next chunk decodes on the pool while earlier chunks are in the model,
+    and a chunk's lines are sent as soon as its inference finishes.
+    """
+    started = time.perf_counter()
+    summary = {"images": 0, "errors": 0}
+    in_flight = deque()
+
+    def finish(chunk):
+        results = list(chunk_results(*chunk, k))
+        with metrics.stage("serialize"):
+            lines = "".join(json.dumps(result) + "\n" for result in results)
+        summary["images"] += len(results)
+        summary["errors"] += sum("error" in result for result in results)
+        return lines
+
+    items = read_ahead(decode_uploads(uploads), MAX_BATCH_SIZE)
+    for chunk in chunked(items, MAX_BATCH_SIZE):
+        in_flight.append(submit_chunk(chunk))
+        if len(in_flight) > BATCH_IN_FLIGHT:
+            yield finish(in_flight.popleft())
+    while in_flight:
+        yield finish(in_flight.popleft())
+
+    seconds = time.perf_counter() - started
+    yield json.dumps({
+        "done": True,
+        **summary,
+        "seconds": seconds,
+        "images_per_second": summary["images"] / seconds if seconds else 0.0
+    }) + "\n"
+
 @app.route("/predict", methods=["POST"])
 def predict():
-    if not model or not labels_map:
-        return jsonify({"error": "Model or Labels not loaded properly on server."}), 500
+    """
+    One "file" part -> {"predictions": [...]}.
+    Several "file" parts -> {"batch": [{"filename", "predictions"}, ...]},
+    all scored in a single model call. Repeated uploads come from the cache.
+    """
+    if not startup.ready:
+        return jsonify({"error": "Model not ready (still loading, or failed to load)"}), 503
+
+    with metrics.stage("read"):
+        # First access to request.files parses (receives) the multipart body
+        files = request.files.getlist("file")
+        images = [file.read() for file in files]
 
-    if "file" not in request.files:
+    if not files:
         return jsonify({"error": "No file part in request"}), 400
 
-    file = request.files["file"]
-    if file.filename == "":
+    if any(file.filename == "" for file in files):
         return jsonify({"error": "No file uploaded"}), 400
 
+    k = parse_top_k()
+    if k is None:
+        return jsonify({"error": "k must be a positive integer"}), 400
+
     try:
-        # Read and Preprocess
-        buffer = file.read()
-        tensor = preprocess_image(buffer)
-
-        # Predict
-        # verbose=0 prevents cluttering server logs
-        raw_predictions = model.predict(tensor, verbose=0)[0] 
-
-        # Convert to standard python list
-        probs = raw_predictions.tolist()
-
-        # Organize results
-        results = []
-        for idx, probability in enumerate(probs):
-            # Get label info, default to "Unknown" if index missing
-            label_info = labels_map.get(idx, {"plant": "Unknown", "disease": "Unknown"})
-            
-            results.append({
-                "index": idx,
-                "probability": float(probability), # ensure float for JSON serialization
-                "plant": label_info.get("plant"),
-                "disease": label_info.get("disease"),
-                "healthy": label_info.get("healthy", False)
-            })
+        # Preprocess and Predict (cache first)
+        raw_predictions = predict_images(images)
 
-        # Sort by probability (Highest first) and take Top 3
-        top_3 = sorted(results, key=lambda x: x["probability"], reverse=True)[:3]
+        with metrics.stage("postprocess"):
+            # Top-k per image, highest first
+            top = top_k_predictions(raw_predictions, k, label_table)
 
-        return jsonify({
-            "predictions": top_3
-        })
+            if len(files) == 1:
+                return jsonify({
+                    "predictions": top[0]
+                })
+            return jsonify({
+                "batch": [{"filename": file.filename, "predictions": preds} for file, preds in zip(files, top)]
+            })
 
     except Exception as e:
         print(f"Prediction Error: {e}")
         return jsonify({"error": "Internal processing error", "details": str(e)}), 500
 
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    """
+    Bulk scoring. Accepts any number of "file" parts, each an image or a .zip
+    of images, or a raw zip body (Content-Type: application/zip).
+    Streams application/x-ndjson: one {"filename", "predictions"} or
+    {"filename", "error"} line per image as results complete, then a
+    {"done": true, ...} summary line.
+    """
+    if not startup.ready:
+        return jsonify({"error": "Model not ready (still loading, or failed to load)"}), 503
+
+    k = parse_top_k()
+    if k is None:
+        return jsonify({"error": "k must be a positive integer"}), 400
+
+    files = keep_uploads(request)
+    if not files:
+        return jsonify({"error": "No file part in request"}), 400
+
+    uploads = iter_uploads(files, MAX_IMAGE_BYTES)
+    return Response(stream_with_context(stream_batch_predictions(uploads, k)),
+                    mimetype="application/x-ndjson")
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    if not batcher:
+        return jsonify({"error": "Model not loaded"}), 500
+    return jsonify({
+        "batching": batcher.stats(),
+        "cache": cache.stats() if cache is not None else None,
+        "runtime": runtime_info,
+        "startup": startup.report()
+    })
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text format: per-stage and per-endpoint latency histograms"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/health/live", methods=["GET"])
+def liveness():
+    """The process answers HTTP (the model may still be loading)"""
+    return jsonify({"status": "alive", "pid": os.getpid()})
+
+@app.route("/health/ready", methods=["GET"])
+def readiness():
+    """200 once model, labels and warm-up are done in this worker, 503 before"""
+    return jsonify(startup.report()), 200 if startup.ready else 503
+
+def load_and_start():
+    load_model_resources()
+    start_worker()
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    # Development server, one process. Production: gunicorn -c gunicorn.conf.py wsgi:app
+    # The model loads in the background so /health/live answers immediately
+    threading.Thread(target=load_and_start, name="model-loader", daemon=True).start()
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", "5000")), threaded=True,
+            debug=os.environ.get("FLASK_DEBUG") == "1", use_reloader=False)
@@ -0,0 +1,109 @@
+import shutil
+import tempfile
+import zipfile
+from collections import deque
+from itertools import islice
+
+from werkzeug.datastructures import FileStorage
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+ZIP_MIMETYPES = ("application/zip", "application/x-zip-compressed")
+
+
+def is_zip(file):
+    return file.filename.lower().endswith(".zip") or file.mimetype in ZIP_MIMETYPES
+
+
+def spool(stream, filename, content_type, max_memory=8 * 1024 * 1024):
+    """
+    Copy of an upload the streamed response can own: Flask closes
+    request.files when the view returns, before the response body is read.
+    Over max_memory the copy goes to a temporary file, and it is seekable
+    (zipfile seeks to the central directory at the end of the archive).
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    shutil.copyfileobj(stream, spooled, 1024 * 1024)
+    spooled.seek(0)
+    return FileStorage(stream=spooled, filename=filename, content_type=content_type)
+
+
+def keep_uploads(request):
+    """
+    The request's "file" parts, or a raw zip body (e.g.
+    curl --data-binary @survey.zip -H "Content-Type: application/zip"),
+    spooled so they outlive the request.
+    """
+    if request.mimetype in ZIP_MIMETYPES:
+        return [spool(request.stream, "upload.zip", request.mimetype)]
+    return [spool(file.stream, file.filename, file.content_type) for file in request.files.getlist("file")]
+
+
+def _read_limited(stream, max_bytes):
+    data = stream.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        return None, f"Image larger than {max_bytes // (1024 * 1024)} MB"
+    return data, None
+
+
+def iter_uploads(files, max_bytes=32 * 1024 * 1024):
+    """
+    Uploaded images and the images inside uploaded .zip archives as
+    (name, bytes, error) tuples, one image in memory at a time.
+    Archive members are read one by one (never extracted to disk); entries
+    that are not images, folders and macOS "__MACOSX/" metadata are skipped.
+    """
+    for file in files:
+        with file.stream:
+            yield from _iter_file(file, max_bytes)
+
+
+def _iter_file(file, max_bytes):
+    if not is_zip(file):
+        data, error = _read_limited(file.stream, max_bytes)
+        yield file.filename, data, error
+        return
+
+    try:
+        archive = zipfile.ZipFile(file.stream)
+    except zipfile.BadZipFile as e:
+        yield file.filename, None, f"Not a valid zip archive: {e}"
+        return
+
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+            if not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            name = f"{file.filename}/{info.filename}"
+            try:
+                # file_size in the header can lie, so the read is capped too
+                with archive.open(info) as member:
+                    data, error = _read_limited(member, max_bytes)
+            except (zipfile.BadZipFile, OSError, RuntimeError) as e:
+                data, error = None, f"Could not read archive member: {e}"
+            yield name, data, error
+
+
+def read_ahead(items, n):
+    """
+    Yield items in order while keeping up to n of them pulled ahead, so work
+    started when an item is produced (e.g. a decode submitted to a pool)
+    runs while the consumer is still busy with earlier items.
+    """
+    buffer = deque()
+    for item in items:
+        buffer.append(item)
+        if len(buffer) > n:
+            yield buffer.popleft()
+    yield from buffer
+
+
+def chunked(items, size):
+    """Lists of up to size consecutive items"""
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,86 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZE = (224, 224)
+
+
+def decode_image(image_bytes, size=IMAGE_SIZE, fast=True):
+    """
+    Bytes -> (224, 224, 3) uint8 RGB array.
+    fast=True lets the JPEG decoder scale down while decoding (draft mode)
+    and resizes large non-JPEG images in reduce() steps first, so a 12 MP
+    phone photo is never decoded at full resolution.
+    """
+    return decode_image_timed(image_bytes, size, fast)[0]
+
+
+def decode_image_timed(image_bytes, size=IMAGE_SIZE, fast=True):
+    """
+    decode_image plus (decode seconds, resize seconds) for the stage metrics.
+    The times travel with the result, so they also come back from process pools.
+    """
+    start = time.perf_counter()
+    img = Image.open(io.BytesIO(image_bytes))
+
+    if fast:
+        # JPEG only: decode at the smallest 1/2, 1/4, 1/8 scale still >= size
+        img.draft("RGB", size)
+    img.load()
+
+    # Ensure RGB (removes Alpha channel if PNG, converts Grayscale if B&W)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    decoded = time.perf_counter()
+
+    if img.size != size:
+        img = img.resize(size, reducing_gap=3.0 if fast else None)
+    pixels = np.asarray(img)
+
+    return pixels, decoded - start, time.perf_counter() - decoded
+
+
+def normalize_into(pixels, out):
+    """uint8 pixels -> out (float32, same shape), 0-255 -> 0-1 with no temporaries"""
+    np.divide(pixels, np.float32(255.0), out=out)
+    return out
+
+
+def mobilenet_normalize_into(pixels, out):
+    """
+    uint8 pixels -> out, 0-255 -> [-1, 1] with no temporaries: what
+    mobilenet_v2.preprocess_input does in the notebook's training cell.
+    """
+    np.divide(pixels, np.float32(127.5), out=out)
+    np.subtract(out, np.float32(1.0), out=out)
+    return out
+
+
+def make_pool(kind="thread", workers=4):
+    """
+    Preprocessing pool. Threads are the default: Pillow releases the GIL while
+    decoding and resizing. Process workers only run decode_image.
+    """
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preprocess")
+
+
+def preprocess_batch(pool, images, fast=True, observe=None):
+    """
+    Decode several uploads in parallel into one preallocated
+    (n, 224, 224, 3) float32 batch.
+    observe(stage, seconds), if given, receives each image's decode / resize time.
+    """
+    batch = np.empty((len(images),) + IMAGE_SIZE + (3,), dtype=np.float32)
+    futures = [pool.submit(decode_image_timed, image_bytes, IMAGE_SIZE, fast) for image_bytes in images]
+    for i, future in enumerate(futures):
+        pixels, decode_s, resize_s = future.result()
+        normalize_into(pixels, batch[i])
+        if observe is not None:
+            observe("decode", decode_s)
+            observe("resize", resize_s)
+    return batch
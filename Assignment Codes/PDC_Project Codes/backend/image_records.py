@@ -0,0 +1,55 @@
+import json
+import os
+
+import numpy as np
+
+# Pre-decoded image records written by the notebook's "Pre-decoded Records" cell:
+#   <split>-NNNNN.images.npy  uint8 (n, 224, 224, 3), memory-mapped, never decoded again
+#   <split>-NNNNN.labels.npy  int16 (n,) class index into index.json "classes"
+#   <split>-NNNNN.paths.txt   source path / zip member of each row, one per line
+#   index.json                {"classes", "image_shape", "source", "shards": [{"name", "split", "count"}]}
+
+
+class ImageRecords:
+    """
+    Read-only view of a records directory. Shards are opened with
+    np.load(mmap_mode="r"), so any row is an O(1) page-cache read and
+    only the rows actually touched are loaded.
+    """
+
+    def __init__(self, records_dir):
+        self.records_dir = records_dir
+        with open(os.path.join(records_dir, "index.json")) as f:
+            self.index = json.load(f)
+        self.classes = self.index["classes"]
+        self._images = {}
+
+    def shards(self, split=None):
+        return [s for s in self.index["shards"] if split is None or s["split"] == split]
+
+    def __len__(self):
+        return sum(s["count"] for s in self.shards())
+
+    def _path(self, name, suffix):
+        return os.path.join(self.records_dir, name + suffix)
+
+    def images(self, name):
+        if name not in self._images:
+            self._images[name] = np.load(self._path(name, ".images.npy"), mmap_mode="r")
+        return self._images[name]
+
+    def labels(self, name):
+        return np.load(self._path(name, ".labels.npy"))
+
+    def paths(self, name):
+        with open(self._path(name, ".paths.txt")) as f:
+            return f.read().splitlines()
+
+    def iter_batches(self, split=None, batch_size=64):
+        """(uint8 pixels view, labels, paths) per batch, shard by shard, in stored order"""
+        for shard in self.shards(split):
+            name = shard["name"]
+            images, labels, paths = self.images(name), self.labels(name), self.paths(name)
+            for start in range(0, shard["count"], batch_size):
+                end = start + batch_size
+                yield images[start:end], labels[start:end], paths[start:end]
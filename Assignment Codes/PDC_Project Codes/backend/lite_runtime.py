@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from image_pipeline import IMAGE_SIZE, decode_image, normalize_into
+
+QUANTIZATIONS = ("none", "dynamic", "fp16", "int8")
+
+
+class TFLiteModel:
+    """
+    Callable like run_model: float32 (n, 224, 224, 3) -> (n, num_classes).
+    The builtin op resolver applies the XNNPACK delegate to float and
+    quantized kernels; num_threads sets its thread pool.
+    One interpreter is not thread-safe, so calls are serialized (the
+    micro-batcher / request threads already funnel into one call at a time).
+    """
+
+    def __init__(self, model_content, num_threads=None):
+        self.content = model_content
+        self.num_threads = num_threads
+        self.interpreter = tf.lite.Interpreter(model_content=model_content, num_threads=num_threads)
+        self._input = self.interpreter.get_input_details()[0]["index"]
+        self._output = self.interpreter.get_output_details()[0]["index"]
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def __call__(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._lock:
+            # Reallocate only when the batch size changes
+            if self._batch_size != len(batch):
+                self.interpreter.resize_tensor_input(self._input, batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self.interpreter.set_tensor(self._input, batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output).copy()
+
+    def clone(self):
+        """
+        New interpreter over the same flatbuffer, e.g. in a forked gunicorn
+        worker: the XNNPACK thread pool does not survive fork, the bytes are
+        shared copy-on-write.
+        """
+        return TFLiteModel(self.content, self.num_threads)
+
+
+def load_samples(samples_dir, limit=64):
+    """Up to `limit` images from samples_dir as one float32 batch (calibration + drift check)"""
+    if not samples_dir or not os.path.isdir(samples_dir):
+        return None
+    images = []
+    for root, _, names in os.walk(samples_dir):
+        for name in sorted(names):
+            if name.lower().endswith((".jpg", ".jpeg", ".png")):
+                images.append(os.path.join(root, name))
+    images = sorted(images)[:limit]
+    if not images:
+        return None
+
+    batch = np.empty((len(images),) + IMAGE_SIZE + (3,), dtype=np.float32)
+    for i, path in enumerate(images):
+        with open(path, "rb") as f:
+            # Full decode: the reference must match training preprocessing
+            normalize_into(decode_image(f.read(), fast=False), batch[i])
+    return batch
+
+
+def convert(keras_model, quantization="none", samples=None):
+    """Keras model -> TFLite flatbuffer bytes with the requested quantization"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if quantization != "none":
+        # dynamic: int8 weights, float activations
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "fp16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        if samples is None:
+            raise ValueError("int8 quantization needs a calibration sample set (TFLITE_SAMPLES_DIR)")
+        # Full-integer kernels; input/output stay float32 so callers don't change
+        converter.representative_dataset = lambda: ([sample[np.newaxis]] for sample in samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+
+def load_or_convert(keras_model, model_path, quantization="none", samples=None):
+    """
+    Reuse <model>.<quantization>.tflite next to the .keras file when it is
+    newer than the model; otherwise convert once and save it there.
+    """
+    tflite_path = f"{os.path.splitext(model_path)[0]}.{quantization}.tflite"
+    if os.path.exists(tflite_path) and os.path.getmtime(tflite_path) >= os.path.getmtime(model_path):
+        with open(tflite_path, "rb") as f:
+            return f.read(), tflite_path
+
+    content = convert(keras_model, quantization, samples)
+    try:
+        with open(tflite_path, "wb") as f:
+            f.write(content)
+    except OSError as e:
+        print(f"Could not save {tflite_path} ({e}); converting again on next start")
+    return content, tflite_path
+
+
+def single_image_latency_ms(fn, sample, runs=20):
+    fn(sample)  # first call allocates / traces
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn(sample)
+    return (time.perf_counter() - start) / runs * 1000.0
+
+
+def drift_report(keras_model, lite_model, samples, chunk=16):
+    """Agreement of the TFLite model with the Keras model on the sample set"""
+    ref = np.concatenate([keras_model.predict(samples[i:i + chunk], verbose=0) for i in range(0, len(samples), chunk)])
+    got = np.concatenate([lite_model(samples[i:i + chunk]) for i in range(0, len(samples), chunk)])
+    diff = np.abs(ref - got)
+    return {
+        "samples": len(samples),
+        "top1_agreement": float(np.mean(ref.argmax(axis=1) == got.argmax(axis=1))),
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+        "keras_latency_ms": single_image_latency_ms(lambda x: keras_model(x, training=False), samples[:1]),
+        "tflite_latency_ms": single_image_latency_ms(lite_model, samples[:1]),
+    }
+
+
+def load_tflite(keras_model, model_path, quantization="none", num_threads=None,
+                samples_dir=None, min_agreement=0.98):
+    """
+    Build the TFLite runtime for keras_model and check it against Keras.
+    Returns (TFLiteModel, drift report or None when there is no sample set).
+    Raises ValueError when top-1 agreement is below min_agreement.
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization '{quantization}', choose from {QUANTIZATIONS}")
+
+    samples = load_samples(samples_dir)
+    content, tflite_path = load_or_convert(keras_model, model_path, quantization, samples)
+    lite_model = TFLiteModel(content, num_threads=num_threads)
+    print(f"TFLite model: {tflite_path} ({len(content) / 1e6:.1f} MB, {quantization}, {num_threads} threads)")
+
+    if samples is None:
+        print("No TFLITE_SAMPLES_DIR images: accuracy-drift check skipped")
+        return lite_model, None
+
+    report = drift_report(keras_model, lite_model, samples)
+    print(f"Drift check on {report['samples']} images: top-1 agreement {report['top1_agreement']:.3f}, "
+          f"max |dp| {report['max_abs_diff']:.4f}, latency {report['keras_latency_ms']:.1f} ms (Keras) "
+          f"-> {report['tflite_latency_ms']:.1f} ms (TFLite)")
+    if report["top1_agreement"] < min_agreement:
+        raise ValueError(f"TFLite top-1 agreement {report['top1_agreement']:.3f} is below {min_agreement}")
+    return lite_model, report
@@ -0,0 +1,145 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching in front of the model.
+    Request threads submit (n, 224, 224, 3) tensors; one background thread
+    stacks whatever arrived within max_wait_ms (up to max_batch_size images),
+    runs a single predict_fn call and hands each request its own rows back.
+    A request larger than max_batch_size is queued as several chunks, so no
+    predict_fn call ever sees more than max_batch_size images.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._carry = None  # item that didn't fit the previous batch; starts the next one
+        self._lock = threading.Lock()
+
+        # Metrics (read through stats())
+        self._batches = 0
+        self._requests = 0
+        self._images = 0
+        self._batch_sizes = Counter()
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._infer_total = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, tensor):
+        """Queue a tensor; the Future resolves to its (n, num_classes) probabilities."""
+        if len(tensor) <= self.max_batch_size:
+            future = Future()
+            self._queue.put((tensor, future, time.perf_counter()))
+            return future
+
+        chunks = [self.submit(tensor[i:i + self.max_batch_size])
+                  for i in range(0, len(tensor), self.max_batch_size)]
+        future = Future()
+        remaining = [len(chunks)]
+        lock = threading.Lock()
+
+        def chunk_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            errors = [chunk.exception() for chunk in chunks if chunk.exception() is not None]
+            if errors:
+                future.set_exception(errors[0])
+            else:
+                future.set_result(np.concatenate([chunk.result() for chunk in chunks]))
+
+        for chunk in chunks:
+            chunk.add_done_callback(chunk_done)
+        return future
+
+    def predict(self, tensor, timeout=None):
+        """Blocking helper for request handlers."""
+        return self.submit(tensor).result(timeout)
+
+    def _collect(self):
+        # Block for the first request, then wait at most max_wait for company.
+        # Requests already queued (backlog) are always taken, deadline or not.
+        # A request that would push the batch over max_batch_size waits for the next one.
+        if self._carry is not None:
+            first, self._carry = self._carry, None
+        else:
+            first = self._queue.get()
+        items = [first]
+        images = len(first[0])
+        deadline = first[2] + self.max_wait
+        while images < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if images + len(item[0]) > self.max_batch_size:
+                self._carry = item
+                break
+            items.append(item)
+            images += len(item[0])
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            start = time.perf_counter()
+            try:
+                batch = np.concatenate([tensor for tensor, _, _ in items])
+                probs = self.predict_fn(batch)
+            except Exception as e:
+                for _, future, _ in items:
+                    future.set_exception(e)
+                continue
+            infer_time = time.perf_counter() - start
+
+            # Split the batch back into one slice per request
+            offset = 0
+            for tensor, future, _ in items:
+                future.set_result(probs[offset:offset + len(tensor)])
+                offset += len(tensor)
+
+            waits = [start - queued for _, _, queued in items]
+            with self._lock:
+                self._batches += 1
+                self._requests += len(items)
+                self._images += offset
+                self._batch_sizes[offset] += 1
+                self._wait_total += sum(waits)
+                self._wait_max = max(self._wait_max, max(waits))
+                self._infer_total += infer_time
+
+    def stats(self):
+        """Batch-size and queue-wait metrics since startup."""
+        with self._lock:
+            batches = self._batches or 1
+            requests = self._requests or 1
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self._batches,
+                "requests": self._requests,
+                "images": self._images,
+                "mean_batch_size": self._images / batches,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_sizes.items())},
+                "mean_queue_wait_ms": self._wait_total / requests * 1000.0,
+                "max_queue_wait_ms": self._wait_max * 1000.0,
+                "mean_inference_ms": self._infer_total / batches * 1000.0,
+                "queue_depth": self._queue.qsize(),
+            }
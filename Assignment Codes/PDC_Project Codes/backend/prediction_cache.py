@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    Probability vectors keyed by a hash of the input bytes.
+    - memory tier: LRU of at most max_entries vectors (a few hundred bytes each)
+    - optional disk tier (disk_dir): one .npy per key, survives restarts
+    - entries older than ttl seconds are treated as missing in both tiers
+    The whole probability vector is cached, so any ?k is answered from it.
+    namespace (e.g. model file + preprocessing settings) is mixed into every
+    key so a new model never reads stale disk entries.
+    """
+
+    def __init__(self, max_entries=10000, ttl=3600.0, disk_dir=None, namespace=""):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.namespace = namespace.encode("utf-8")
+        self._entries = OrderedDict()  # key -> (stored_at, probs)
+        self._lock = threading.Lock()
+        self._counts = dict(hits=0, memory_hits=0, disk_hits=0, misses=0, evictions=0, expired=0, disk_errors=0)
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def key(self, data):
+        """Hash of bytes or any contiguous array (hashed without copying)"""
+        h = hashlib.blake2b(self.namespace, digest_size=16)
+        h.update(data)
+        return h.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".npy")
+
+    def get(self, key):
+        """Cached probabilities for key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, probs = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counts["hits"] += 1
+                    self._counts["memory_hits"] += 1
+                    return probs
+                del self._entries[key]
+                self._counts["expired"] += 1
+
+        entry = self._disk_get(key, now)
+        with self._lock:
+            if entry is None:
+                self._counts["misses"] += 1
+                return None
+            self._counts["hits"] += 1
+            self._counts["disk_hits"] += 1
+            # Keeps the disk entry's age, so a disk hit never extends its TTL
+            stored_at, probs = entry
+            self._store(key, probs, stored_at)
+        return probs
+
+    def _disk_get(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if now - stored_at > self.ttl:
+                os.remove(path)
+                return None
+            return stored_at, np.load(path)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, probs):
+        # Own copy: a row view would keep the whole batch array alive
+        probs = np.array(probs)
+        now = time.time()
+        with self._lock:
+            self._store(key, probs, now)
+        if self.disk_dir:
+            self._disk_put(key, probs)
+
+    def _disk_put(self, key, probs):
+        # Called after inference succeeded: a full disk or read-only CACHE_DIR
+        # only costs the disk copy, never the response
+        path = self._disk_path(key)
+        # Write then rename so readers never see a partial file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                np.save(f, probs)
+            os.replace(tmp, path)
+        except OSError:
+            with self._lock:
+                self._counts["disk_errors"] += 1
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def _store(self, key, probs, now):
+        self._entries[key] = (now, probs)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counts["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                **self._counts,
+                "hit_rate": self._counts["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_dir": self.disk_dir,
+            }
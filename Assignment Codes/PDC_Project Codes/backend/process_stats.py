@@ -0,0 +1,72 @@
+import os
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def memory_usage():
+    """
+    Memory of this process in MB.
+    On Linux /proc/self/smaps_rollup also splits RSS into pages still shared
+    with the gunicorn master / other workers (copy-on-write after fork) and
+    pages private to this worker; PSS charges each shared page 1/N per process.
+    """
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line and not line[0].isspace())
+        kb = {name: int(value.split()[0]) for name, value in fields.items() if value.strip().endswith("kB")}
+        usage["rss_mb"] = kb["Rss"] / 1024.0
+        usage["pss_mb"] = kb.get("Pss", 0) / 1024.0
+        usage["shared_mb"] = (kb.get("Shared_Clean", 0) + kb.get("Shared_Dirty", 0)) / 1024.0
+        usage["private_mb"] = (kb.get("Private_Clean", 0) + kb.get("Private_Dirty", 0)) / 1024.0
+    except (OSError, KeyError, ValueError):
+        pass
+    if resource is not None:
+        # ru_maxrss is KB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage["peak_rss_mb"] = peak / (1024.0 * 1024.0) if os.uname().sysname == "Darwin" else peak / 1024.0
+    return usage
+
+
+class StartupTimer:
+    """Wall time of each startup phase (import, model load, warm-up, ...)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases = {}
+        self.ready = False
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - self._last)
+        self._last = now
+
+    def restart(self):
+        # Forked worker: its own phases count from the fork, the master's stay as they were
+        self._last = time.perf_counter()
+
+    def report(self):
+        return {
+            "pid": os.getpid(),
+            "ready": self.ready,
+            "phases_s": {phase: round(seconds, 3) for phase, seconds in self.phases.items()},
+            "since_import_s": round(time.perf_counter() - self.started, 3),
+            "memory": memory_usage(),
+        }
+
+    def summary(self):
+        report = self.report()
+        phases = ", ".join(f"{phase} {seconds:.2f} s" for phase, seconds in report["phases_s"].items())
+        memory = report["memory"]
+        line = f"[pid {report['pid']}] {phases or 'no phases'}"
+        if "rss_mb" in memory:
+            line += (f"; RSS {memory['rss_mb']:.0f} MB (shared {memory['shared_mb']:.0f}, "
+                     f"private {memory['private_mb']:.0f}, PSS {memory['pss_mb']:.0f})")
+        elif "peak_rss_mb" in memory:
+            line += f"; peak RSS {memory['peak_rss_mb']:.0f} MB"
+        return line
@@ -0,0 +1,133 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Seconds: sub-millisecond cache hits up to multi-second cold inference
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense (le = upper bound)"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+class RequestMetrics:
+    """
+    Per-stage latency histograms plus per-request tracing for one Flask app.
+    - stage(name) / observe(name, seconds): time a stage (decode, resize,
+      serialize, network, inference, postprocess, ...)
+    - before_request / after_request: request id from the X-Request-ID header
+      (or a new one), echoed back and sent on to machine B; the stage
+      breakdown goes into a Server-Timing header and, for requests slower
+      than slow_ms, into the log under the request id
+    - render(): Prometheus text format for the /metrics route
+    Under gunicorn every worker keeps its own histograms.
+    """
+
+    def __init__(self, service, slow_ms=1000.0):
+        self.service = service
+        self.slow = slow_ms / 1000.0
+        self._stages = {}    # stage -> Histogram
+        self._requests = {}  # (method, endpoint, status) -> Histogram
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            if stage not in self._stages:
+                self._stages[stage] = Histogram()
+            self._stages[stage].observe(seconds)
+        if has_request_context() and "stage_times" in g:
+            g.stage_times[stage] = g.stage_times.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def before_request(self):
+        g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+        g.stage_times = {}
+
+    def after_request(self, response):
+        elapsed = time.perf_counter() - g.request_started
+        key = (request.method, request.url_rule.rule if request.url_rule else "unmatched", str(response.status_code))
+        with self._lock:
+            if key not in self._requests:
+                self._requests[key] = Histogram()
+            self._requests[key].observe(elapsed)
+
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+        timings = [f"{stage};dur={seconds * 1000.0:.2f}" for stage, seconds in g.stage_times.items()]
+        timings.append(f"total;dur={elapsed * 1000.0:.2f}")
+        response.headers["Server-Timing"] = ", ".join(timings)
+
+        if elapsed > self.slow and not response.is_streamed:
+            stages = ", ".join(f"{stage} {seconds * 1000.0:.1f} ms" for stage, seconds in g.stage_times.items())
+            print(f"Slow request {g.request_id}: {request.method} {request.path} "
+                  f"{elapsed * 1000.0:.1f} ms ({stages})")
+        return response
+
+    def render(self):
+        lines = [
+            "# HELP stage_duration_seconds Time spent per processing stage.",
+            "# TYPE stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._stages.items()):
+                lines.extend(histogram.samples("stage_duration_seconds",
+                                               f'service="{self.service}",stage="{stage}"'))
+            lines.append("# HELP http_request_duration_seconds Request handling time "
+                         "(streamed responses: until the body starts).")
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for (method, endpoint, status), histogram in sorted(self._requests.items()):
+                lines.extend(histogram.samples(
+                    "http_request_duration_seconds",
+                    f'service="{self.service}",method="{method}",endpoint="{endpoint}",status="{status}"'))
+        return "\n".join(lines) + "\n"
+
+
+def request_id_headers():
+    """Headers that carry the current request id on to another service"""
+    if has_request_context() and "request_id" in g:
+        return {REQUEST_ID_HEADER: g.request_id}
+    return {}
+
+
+def server_timing(response, metric="total"):
+    """Seconds of `metric` from another service's Server-Timing header, or None"""
+    for entry in response.headers.get("Server-Timing", "").split(","):
+        name, _, params = entry.strip().partition(";")
+        if name == metric and params.startswith("dur="):
+            return float(params[4:]) / 1000.0
+    return None
@@ -0,0 +1,110 @@
+"""
+Batch scorer over pre-decoded image records (see image_records.py):
+no JPEG decode or resize per image, only normalization and inference.
+Pixels are scaled to [-1, 1] like the training cell's
+mobilenet_v2.preprocess_input; --normalize unit uses the Flask apps' /255.
+
+    python score_records.py ../records --split test --out test_predictions.ndjson
+    RUNTIME=tflite python score_records.py ../records
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+from image_pipeline import IMAGE_SIZE, mobilenet_normalize_into, normalize_into
+from image_records import ImageRecords
+from top_k import top_k
+
+NORMALIZERS = {"mobilenet": mobilenet_normalize_into, "unit": normalize_into}
+
+
+def prefetch(batches, depth=2):
+    """Pull batches on a thread so page-in of the next shard rows overlaps inference"""
+    q = queue.Queue(maxsize=depth)
+    done = object()
+
+    def fill():
+        try:
+            for batch in batches:
+                q.put(batch)
+        finally:
+            q.put(done)
+
+    threading.Thread(target=fill, daemon=True, name="records-prefetch").start()
+    while True:
+        batch = q.get()
+        if batch is done:
+            return
+        yield batch
+
+
+def load_runtime(model_path, runtime, threads):
+    import tensorflow as tf
+    model = tf.keras.models.load_model(model_path)
+    if runtime == "tflite":
+        from lite_runtime import load_or_convert, TFLiteModel
+        content, _ = load_or_convert(model, model_path)
+        return TFLiteModel(content, num_threads=threads)
+    return lambda batch: model(batch, training=False).numpy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score pre-decoded image records")
+    parser.add_argument("records_dir")
+    parser.add_argument("--split", default=None, help="train / test (default: all shards)")
+    parser.add_argument("--model", default=os.path.join("..", "model", "best_model.keras"))
+    parser.add_argument("--runtime", default=os.environ.get("RUNTIME", "keras"), choices=("keras", "tflite"))
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--normalize", choices=sorted(NORMALIZERS), default="mobilenet",
+                        help="mobilenet: [-1, 1] as in training (default); unit: /255 as the Flask apps")
+    parser.add_argument("--out", default="-", help="NDJSON output file (default: stdout)")
+    args = parser.parse_args()
+
+    records = ImageRecords(args.records_dir)
+    shape = tuple(records.index["image_shape"])
+    if shape != IMAGE_SIZE + (3,):
+        raise SystemExit(f"Records are {shape}, the model expects {IMAGE_SIZE + (3,)}")
+    run_model = load_runtime(args.model, args.runtime, args.threads)
+    normalize = NORMALIZERS[args.normalize]
+
+    out = open(args.out, "w") if args.out != "-" else None
+    batch = np.empty((args.batch_size,) + IMAGE_SIZE + (3,), dtype=np.float32)
+    scored = correct = 0
+    start = time.perf_counter()
+    try:
+        for pixels, labels, paths in prefetch(records.iter_batches(args.split, args.batch_size)):
+            n = len(pixels)
+            probs = run_model(normalize(pixels, batch[:n]))
+            if probs.shape[1] != len(records.classes):
+                raise SystemExit(f"Model has {probs.shape[1]} outputs, the records {len(records.classes)} classes")
+            top, top_probs = top_k(probs, args.top_k)
+            for i in range(n):
+                line = json.dumps({
+                    "path": paths[i],
+                    "label": records.classes[labels[i]],
+                    "top": [{"class": records.classes[c], "confidence": round(float(p), 4)}
+                            for c, p in zip(top[i], top_probs[i])],
+                })
+                print(line, file=out)
+            scored += n
+            correct += int(np.sum(top[:, 0] == labels))
+    finally:
+        if out is not None:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    if scored:
+        print(f"Scored {scored} images in {elapsed:.1f} s ({scored / elapsed:.0f} img/s), "
+              f"top-1 accuracy {correct / scored:.4f} ({args.normalize} inputs)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import numpy as np
+from flask import request
+
+DEFAULT_TOP_K = 3
+
+
+def top_k(probs, k):
+    """
+    (n, num_classes) probabilities -> (class indices, probabilities), both
+    (n, min(k, num_classes)) and best first. argpartition picks the k largest
+    in O(num_classes); only those k are sorted.
+    """
+    k = min(k, probs.shape[1])
+    top_idx = np.argpartition(probs, -k, axis=1)[:, -k:]
+    top_probs = np.take_along_axis(probs, top_idx, axis=1)
+    order = np.argsort(-top_probs, axis=1)
+    return np.take_along_axis(top_idx, order, axis=1), np.take_along_axis(top_probs, order, axis=1)
+
+
+def top_k_predictions(probs, k, label_table):
+    """(n, num_classes) probabilities -> n lists of the k best classes, with their labels"""
+    top_idx, top_probs = top_k(probs, k)
+
+    return [
+        [{"index": idx, "probability": p, **label_table[idx]} for idx, p in zip(row_idx, row_probs)]
+        for row_idx, row_probs in zip(top_idx.tolist(), top_probs.tolist())
+    ]
+
+
+def parse_top_k():
+    """?k=N query parameter (default 3); None unless it is a positive integer"""
+    raw = request.args.get("k")
+    if raw is None:
+        return DEFAULT_TOP_K
+    try:
+        k = int(raw)
+    except ValueError:
+        return None
+    return k if k >= 1 else None
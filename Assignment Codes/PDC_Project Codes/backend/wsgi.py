@@ -0,0 +1,12 @@
+"""
+Production entry point:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app (see gunicorn.conf.py) this module is imported once in the
+gunicorn master, so the model is loaded once and the workers share it
+through fork; otherwise every worker imports it and loads its own copy.
+"""
+from app import app, load_model_resources
+
+load_model_resources()
@@ -1,48 +1,279 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import numpy as np
-from PIL import Image
 import io
-import requests
+import json
+import os
+import time
+from collections import deque
+import sys
+
+# Helpers shared with the single-machine app live in ../backend (a plain path
+# entry rather than symlinks, which git checks out as text files on Windows)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "backend"))
+
+from batch_uploads import chunked, iter_uploads, keep_uploads, read_ahead
+from image_pipeline import IMAGE_SIZE, decode_image_timed, make_pool
+from replica_pool import NoReplicaAvailable, ReplicaPool
+from request_metrics import RequestMetrics, request_id_headers, server_timing
+from tensor_wire import encode_pixels
+from top_k import parse_top_k
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Request-ID", "Server-Timing"])
+
+# Per-stage latency histograms (/metrics); the request id goes on to machine B
+metrics = RequestMetrics("machine_a", slow_ms=float(os.environ.get("SLOW_REQUEST_MS", "1000")))
+app.before_request(metrics.before_request)
+app.after_request(metrics.after_request)
+
+# Machine B replicas, comma-separated base URLs, e.g.
+# INFERENCE_REPLICAS=http://10.0.0.2:5001,http://10.0.0.2:5002,http://10.0.0.3:5001
+INFERENCE_REPLICAS = [url.strip() for url in os.environ.get("INFERENCE_REPLICAS", "http://127.0.0.1:5001").split(",")
+                      if url.strip()]
+CONNECT_TIMEOUT = float(os.environ.get("CONNECT_TIMEOUT", "2"))
+READ_TIMEOUT = float(os.environ.get("READ_TIMEOUT", "30"))
+HEALTH_INTERVAL = float(os.environ.get("HEALTH_INTERVAL", "5"))
+
+# "raw": uint8 pixels as application/octet-stream (normalized on B, ~4x fewer bytes)
+# "npy": float32 .npy multipart upload (older machine B without /predict/raw)
+TRANSPORT = os.environ.get("TRANSPORT", "raw")
+# zlib the raw pixels as well (worth it on slow links only)
+COMPRESS = os.environ.get("COMPRESS", "0") == "1"
+
+# Decode/resize pool ("thread" or "process"); FAST_DECODE=0 disables JPEG draft decoding
+PREPROCESS_POOL = os.environ.get("PREPROCESS_POOL", "thread")
+PREPROCESS_WORKERS = int(os.environ.get("PREPROCESS_WORKERS", "4"))
+FAST_DECODE = os.environ.get("FAST_DECODE", "1") != "0"
 
-INFERENCE_URL = "http://127.0.0.1:5001/predict"             #set the url where machine B is hosted
+# /predict/batch: BATCH_CHUNK images per request to machine B, at most
+# BATCH_IN_FLIGHT chunks outstanding (default: two per replica)
+BATCH_CHUNK = int(os.environ.get("BATCH_CHUNK", "16"))
+BATCH_IN_FLIGHT = int(os.environ.get("BATCH_IN_FLIGHT", str(2 * len(INFERENCE_REPLICAS))))
+MAX_IMAGE_BYTES = int(float(os.environ.get("MAX_IMAGE_MB", "32")) * 1024 * 1024)
 
-def preprocess_image(image_bytes):
-    img = Image.open(io.BytesIO(image_bytes))
 
-    if img.mode != "RGB":
-        img = img.convert("RGB")
+preprocess_pool = make_pool(PREPROCESS_POOL, PREPROCESS_WORKERS)
 
-    img = img.resize((224, 224))
-    img_array = np.array(img).astype("float32") / 255.0
-    img_array = np.expand_dims(img_array, axis=0)
+# Keep-alive connections + least-outstanding balancing over the replicas
+replicas = ReplicaPool(
+    INFERENCE_REPLICAS,
+    connect_timeout=CONNECT_TIMEOUT,
+    read_timeout=READ_TIMEOUT,
+    health_interval=HEALTH_INTERVAL,
+)
 
-    return img_array
+def send_to_machine_b(pixels, params):
+    """(n,224,224,3) uint8 pixels -> Future of machine B's response"""
+    if TRANSPORT == "npy":
+        # Float32 tensor as a .npy multipart upload
+        with metrics.stage("serialize"):
+            buffer = io.BytesIO()
+            np.save(buffer, pixels.astype(np.float32) / 255.0)
+        return replicas.submit(
+            "/predict",
+            params=params,
+            files={"tensor": ("tensor.npy", buffer.getvalue(), "application/octet-stream")},
+            headers=request_id_headers()
+        )
+
+    # Raw pixels; B does the / 255.0
+    with metrics.stage("serialize"):
+        payload = encode_pixels(pixels, compress=COMPRESS)
+    return replicas.submit(
+        "/predict/raw",
+        params=params,
+        data=payload,
+        headers={"Content-Type": "application/octet-stream", **request_id_headers()}
+    )
+
+def decoded_pixels(future):
+    """Result of a decode_image_timed future; its decode / resize times go to the metrics"""
+    pixels, decode_s, resize_s = future.result()
+    metrics.observe("decode", decode_s)
+    metrics.observe("resize", resize_s)
+    return pixels
+
+def machine_b_result(future):
+    """
+    Machine B's response; the round trip is split into B's own time
+    (its Server-Timing total) and the rest (network, connection queueing).
+    """
+    response = future.result()
+    roundtrip = response.elapsed.total_seconds()
+    remote = server_timing(response)
+    if remote is not None:
+        metrics.observe("machine_b", remote)
+        roundtrip = max(roundtrip - remote, 0.0)
+    metrics.observe("network", roundtrip)
+    return response
+
+def machine_b_body(response):
+    """(JSON body, None) when machine B answered 200, else (None, error message)"""
+    try:
+        body = response.json()
+    except ValueError:
+        # e.g. an HTML error page from a proxy in front of B
+        return None, f"Machine B answered HTTP {response.status_code} without a JSON body"
+    if response.status_code != 200:
+        error = body.get("error") if isinstance(body, dict) else None
+        return None, error or f"Machine B answered HTTP {response.status_code}"
+    return body, None
 
 @app.route("/predict", methods=["POST"])
 def predict():
-    if "file" not in request.files:
+    """
+    One "file" part -> machine B's response as is.
+    Several "file" parts are fanned out across the replicas concurrently
+    and returned as {"batch": [{"filename", "predictions"}, ...]}.
+    """
+    with metrics.stage("read"):
+        # First access to request.files parses (receives) the multipart body
+        files = request.files.getlist("file")
+        images = [file.read() for file in files]
+
+    if not files:
         return jsonify({"error": "No file uploaded"}), 400
 
-    file = request.files["file"]
-    image_bytes = file.read()
+    # ?k=N is checked here and passed through to machine B
+    k = parse_top_k()
+    if k is None:
+        return jsonify({"error": "k must be a positive integer"}), 400
+    params = {"k": k}
 
-    tensor = preprocess_image(image_bytes)
+    # Decode every upload on the pool, send each one as soon as it is ready
+    decoded = [preprocess_pool.submit(decode_image_timed, image, IMAGE_SIZE, FAST_DECODE) for image in images]
+    sent = []
+    try:
+        for file, future in zip(files, decoded):
+            try:
+                pixels = decoded_pixels(future)
+            except Exception as e:
+                # The upload is not a readable image: the client's error, not machine B's
+                for pending in decoded:
+                    pending.cancel()
+                return jsonify({"error": f"Could not decode image {file.filename!r}: {e}"}), 400
+            sent.append(send_to_machine_b(pixels[np.newaxis], params))
+        responses = [machine_b_result(future) for future in sent]
+    except NoReplicaAvailable as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        return jsonify({"error": "Inference request failed", "details": str(e)}), 502
 
-    # Send tensor to Machine B
-    buffer = io.BytesIO()
-    np.save(buffer, tensor)
-    buffer.seek(0)
+    with metrics.stage("postprocess"):
+        results = [machine_b_body(response) for response in responses]
+        if len(responses) == 1:
+            body, error = results[0]
+            if error is not None:
+                status = responses[0].status_code
+                return jsonify({"error": error}), status if status >= 400 else 502
+            return jsonify(body)
+        return jsonify({
+            "batch": [{"filename": file.filename, **body} if error is None else {"filename": file.filename, "error": error}
+                      for file, (body, error) in zip(files, results)]
+        })
 
-    response = requests.post(
-        INFERENCE_URL,
-        files={"tensor": ("tensor.npy", buffer, "application/octet-stream")}
+def send_chunk(chunk, params):
+    """Wait for a chunk's decodes, send the decoded images to machine B as one tensor"""
+    names, errors, pixels = [], [], []
+    for name, future, error in chunk:
+        if future is not None:
+            try:
+                pixels.append(decoded_pixels(future))
+            except Exception as e:
+                error = f"Could not decode image: {e}"
+        names.append(name)
+        errors.append(error)
+
+    response = send_to_machine_b(np.stack(pixels), params) if pixels else None
+    return names, errors, response
+
+def chunk_results(names, errors, response):
+    """One result dict per image of the chunk, in upload order"""
+    predictions = []
+    if response is not None:
+        try:
+            body, error = machine_b_body(machine_b_result(response))
+            if error is not None:
+                raise RuntimeError(error)
+            # B answers {"predictions"} for one image, {"batch": [...]} for several
+            predictions = [item["predictions"] for item in body["batch"]] if "batch" in body else [body["predictions"]]
+        except Exception as e:
+            errors = [error or f"Inference request failed: {e}" for error in errors]
+
+    predictions = iter(predictions)
+    for name, error in zip(names, errors):
+        if error is None:
+            yield {"filename": name, "predictions": next(predictions)}
+        else:
+            yield {"filename": name, "error": error}
+
+def stream_batch_predictions(uploads, params):
+    """
+    Decode on the pool, send chunks of BATCH_CHUNK images to the replicas
+    while the next chunk decodes, and stream each chunk's NDJSON lines (in
+    upload order) as soon as machine B answers.
+    """
+    started = time.perf_counter()
+    summary = {"images": 0, "errors": 0}
+    in_flight = deque()
+
+    def finish(chunk):
+        results = list(chunk_results(*chunk))
+        with metrics.stage("postprocess"):
+            lines = "".join(json.dumps(result) + "\n" for result in results)
+        summary["images"] += len(results)
+        summary["errors"] += sum("error" in result for result in results)
+        return lines
+
+    decoded = (
+        (name, None if error else preprocess_pool.submit(decode_image_timed, data, IMAGE_SIZE, FAST_DECODE), error)
+        for name, data, error in uploads
     )
+    for chunk in chunked(read_ahead(decoded, BATCH_CHUNK), BATCH_CHUNK):
+        in_flight.append(send_chunk(chunk, params))
+        if len(in_flight) > BATCH_IN_FLIGHT:
+            yield finish(in_flight.popleft())
+    while in_flight:
+        yield finish(in_flight.popleft())
+
+    seconds = time.perf_counter() - started
+    yield json.dumps({
+        "done": True,
+        **summary,
+        "seconds": seconds,
+        "images_per_second": summary["images"] / seconds if seconds else 0.0
+    }) + "\n"
+
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    """
+    Bulk scoring: "file" parts (images or .zip archives of images) or a raw
+    zip body. Streams application/x-ndjson, one {"filename", "predictions"}
+    or {"filename", "error"} line per image, then a {"done": true} summary.
+    """
+    files = keep_uploads(request)
+    if not files:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    # ?k=N is checked here and passed through to machine B
+    k = parse_top_k()
+    if k is None:
+        return jsonify({"error": "k must be a positive integer"}), 400
+    params = {"k": k}
+
+    uploads = iter_uploads(files, MAX_IMAGE_BYTES)
+    return Response(stream_with_context(stream_batch_predictions(uploads, params)),
+                    mimetype="application/x-ndjson")
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text format: per-stage and per-endpoint latency histograms"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
-    return jsonify(response.json())
+@app.route("/replicas", methods=["GET"])
+def replica_status():
+    return jsonify({"replicas": replicas.status()})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,36 @@
+# gunicorn -c gunicorn_machineB.py wsgi_machineB:app
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+workers = int(os.environ.get("WEB_WORKERS", "2"))
+# Threads per worker: concurrent requests from machine A
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", "8"))
+# Model load / TFLite conversion can take longer than the default 30 s
+timeout = int(os.environ.get("WEB_TIMEOUT", "120"))
+
+# PRELOAD=1: load once in the master, workers share the model pages copy-on-write.
+# Default only for RUNTIME=tflite: workers then build a fresh interpreter over
+# the shared flatbuffer and never touch the TensorFlow runtime, whose thread
+# pools don't survive fork. Keras workers load their own model by default.
+preload_app = os.environ.get("PRELOAD", "1" if os.environ.get("RUNTIME") == "tflite" else "0") == "1"
+
+# Split the cores between workers instead of every worker using all of them
+# (read by TensorFlow / the app when they start)
+_threads_per_worker = str(max(1, multiprocessing.cpu_count() // workers))
+os.environ.setdefault("TF_NUM_INTRAOP_THREADS", _threads_per_worker)
+os.environ.setdefault("TF_NUM_INTEROP_THREADS", "1")
+os.environ.setdefault("TFLITE_THREADS", _threads_per_worker)
+
+
+def when_ready(server):
+    if preload_app:
+        import inference_api_machineB as machine_b
+        server.log.info("Master preloaded: %s", machine_b.startup.summary())
+
+
+def post_worker_init(worker):
+    # After fork (and, without preload, after this worker loaded the model)
+    import inference_api_machineB as machine_b
+    machine_b.start_worker()
@@ -1,66 +1,276 @@
-from flask import Flask, request, jsonify
-import tensorflow as tf
+from flask import Flask, Response, request, jsonify
 import numpy as np
 import json
 import os
 import io
+import threading
+import sys
+
+# Helpers shared with the single-machine app live in ../backend (a plain path
+# entry rather than symlinks, which git checks out as text files on Windows)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "backend"))
+
+from tensor_wire import MAX_IMAGES, read_pixels
+from prediction_cache import PredictionCache
+from process_stats import StartupTimer
+from request_metrics import RequestMetrics
+from top_k import parse_top_k, top_k_predictions
 
 app = Flask(__name__)
 
+# Per-stage latency histograms (/metrics). X-Request-ID from machine A is kept,
+# and the Server-Timing header lets A separate B's time from the network.
+metrics = RequestMetrics("machine_b", slow_ms=float(os.environ.get("SLOW_REQUEST_MS", "1000")))
+app.before_request(metrics.before_request)
+app.after_request(metrics.after_request)
+
 model = None
 labels_map = None
+label_table = None
+cache = None
+lite_model = None
+runtime_info = {"runtime": "keras"}
+loaded_pid = None
+startup = StartupTimer()
+
+
+# Largest n accepted in one /predict/raw tensor (machine A sends BATCH_CHUNK)
+MAX_TENSOR_IMAGES = int(os.environ.get("MAX_TENSOR_IMAGES", str(MAX_IMAGES)))
+
+# Prediction cache keyed by a hash of the received tensor (CACHE_SIZE=0 disables it)
+CACHE_SIZE = int(os.environ.get("CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.environ.get("CACHE_TTL", "3600"))
+CACHE_DIR = os.environ.get("CACHE_DIR")  # optional on-disk tier
+
+# Inference runtime: "keras" or "tflite" (XNNPACK, optional quantization)
+RUNTIME = os.environ.get("RUNTIME", "keras")
+TFLITE_QUANT = os.environ.get("TFLITE_QUANT", "none")  # none, dynamic, fp16, int8
+TFLITE_THREADS = int(os.environ.get("TFLITE_THREADS", str(os.cpu_count() or 1)))
+TFLITE_SAMPLES_DIR = os.environ.get("TFLITE_SAMPLES_DIR")  # images for int8 calibration + drift check
+TFLITE_MIN_AGREEMENT = float(os.environ.get("TFLITE_MIN_AGREEMENT", "0.98"))
+
+def run_model(batch):
+    if lite_model is not None:
+        return lite_model(batch)
+    return model.predict(batch, verbose=0)
+
+def load_lite_runtime(model_path):
+    """Switch run_model to TFLite; stays on Keras if conversion or the drift check fails"""
+    global lite_model, runtime_info
+    from lite_runtime import load_tflite
+    try:
+        lite_model, report = load_tflite(model, model_path, TFLITE_QUANT, TFLITE_THREADS,
+                                          TFLITE_SAMPLES_DIR, TFLITE_MIN_AGREEMENT)
+        runtime_info = {"runtime": "tflite", "quantization": TFLITE_QUANT,
+                        "threads": TFLITE_THREADS, "drift": report}
+    except Exception as e:
+        print(f"TFLite runtime not used, serving with Keras. Details: {e}")
 
 def load_model_resources():
-    global model, labels_map
+    """Runs once in the gunicorn master with preload_app, else once per worker"""
+    global model, labels_map, label_table, cache, loaded_pid
+    loaded_pid = os.getpid()
 
     print("Loading Keras model...")
     model_path = os.path.join("..", "model", "best_model.keras")
+    try:
+        # Lazy import: the process answers /health/live before TensorFlow is in
+        import tensorflow as tf
+        startup.mark("import_tensorflow")
+        model = tf.keras.models.load_model(model_path)
+        startup.mark("load_model")
+        print("Model loaded successfully")
+        if RUNTIME == "tflite":
+            load_lite_runtime(model_path)
+            startup.mark("tflite")
 
-    model = tf.keras.models.load_model(model_path)
-    print("Model loaded successfully")
+        if CACHE_SIZE > 0:
+            # A new model file or runtime never reuses old disk entries
+            namespace = (f"{os.path.abspath(model_path)}:{os.path.getmtime(model_path)}:"
+                         f"{runtime_info['runtime']}:{TFLITE_QUANT}")
+            cache = PredictionCache(CACHE_SIZE, CACHE_TTL, CACHE_DIR, namespace)
+    except Exception as e:
+        print(f"CRITICAL ERROR: Could not load model at {model_path}. Details: {e}")
 
     labels_path = os.path.join(os.path.dirname(__file__), "labels.json")
-    with open(labels_path, "r") as f:
-        data = json.load(f)
-        labels_map = {int(item["index"]): item for item in data}
+    try:
+        with open(labels_path, "r") as f:
+            data = json.load(f)
+            labels_map = {int(item["index"]): item for item in data}
+        print(f"Loaded {len(labels_map)} labels")
+    except Exception as e:
+        print(f"CRITICAL ERROR: Could not load labels.json. Details: {e}")
+        return
 
-    print(f"Loaded {len(labels_map)} labels")
+    # Response label table indexed by class id, built once
+    num_classes = max(labels_map) + 1 if labels_map else 0
+    if model is not None:
+        num_classes = max(num_classes, model.output_shape[-1])
+    label_table = []
+    for idx in range(num_classes):
+        label_info = labels_map.get(idx, {})
+        label_table.append({
+            "plant": label_info.get("plant"),
+            "disease": label_info.get("disease"),
+            "healthy": label_info.get("healthy", False)
+        })
 
-load_model_resources()
+def start_worker():
+    """
+    In the serving process (after fork under gunicorn): fresh TFLite
+    interpreter, then one warm-up inference so the first request doesn't
+    pay model.predict's tracing.
+    """
+    global lite_model
+    startup.restart()
+    if model is None or label_table is None:
+        print("Not serving predictions: model or labels failed to load")
+        return
+
+    if lite_model is not None and os.getpid() != loaded_pid:
+        lite_model = lite_model.clone()
+    try:
+        run_model(np.zeros((1, 224, 224, 3), dtype=np.float32))
+    except Exception as e:
+        print(f"CRITICAL ERROR: Warm-up inference failed. Details: {e}")
+        return
+    startup.mark("warmup")
+    startup.ready = True
+    print(f"Worker ready: {startup.summary()}")
+
+def normalize_pixels(pixels):
+    # 0-255 -> 0-1, must match training preprocessing
+    tensor = np.empty(pixels.shape, dtype=np.float32)
+    np.divide(pixels, np.float32(255.0), out=tensor)
+    return tensor
+
+def predict_cached(inputs, prepare=None):
+    """
+    (n, 224, 224, 3) array as received -> (n, num_classes) probabilities.
+    Each image is keyed by a hash of its own bytes (uint8 pixels or float32
+    tensor); only cache misses go through prepare() and the model.
+    """
+    probs = [None] * len(inputs)
+    keys = []
+    if cache is not None:
+        with metrics.stage("cache"):
+            keys = [cache.key(np.ascontiguousarray(row)) for row in inputs]
+            probs = [cache.get(key) for key in keys]
+
+    missing = [i for i, p in enumerate(probs) if p is None]
+    if missing:
+        batch = inputs[missing] if len(missing) < len(inputs) else inputs
+        if prepare is not None:
+            with metrics.stage("normalize"):
+                batch = prepare(batch)
+        with metrics.stage("inference"):
+            fresh = run_model(batch)
+        for i, row in zip(missing, fresh):
+            probs[i] = row
+            if cache is not None:
+                cache.put(keys[i], row)
+
+    return np.stack(probs)
+
+def predictions_response(predictions, k):
+    with metrics.stage("postprocess"):
+        top = top_k_predictions(predictions, k, label_table)
+
+        if len(top) == 1:
+            return jsonify({"predictions": top[0]})
+        return jsonify({"batch": [{"predictions": preds} for preds in top]})
+
+@app.route("/health", methods=["GET"])
+def health():
+    """Used by machine A's replica health checks (same as /health/ready)"""
+    if not startup.ready:
+        return jsonify({"status": "loading"}), 503
+    return jsonify({"status": "ok"})
+
+@app.route("/health/live", methods=["GET"])
+def liveness():
+    return jsonify({"status": "alive", "pid": os.getpid()})
+
+@app.route("/health/ready", methods=["GET"])
+def readiness():
+    return jsonify(startup.report()), 200 if startup.ready else 503
 
 @app.route("/predict", methods=["POST"])
 def predict():
     """
     Receives a preprocessed tensor (numpy .npy file)
+    Shape (1,224,224,3) -> {"predictions": [...]};
+    shape (n,224,224,3) -> {"batch": [{"predictions": [...]}, ...]}
+    Optional ?k=N (default 3) sets how many classes are returned.
     """
+    if not startup.ready:
+        return jsonify({"error": "Model not ready (still loading, or failed to load)"}), 503
+
     if "tensor" not in request.files:
         return jsonify({"error": "No tensor provided"}), 400
 
+    k = parse_top_k()
+    if k is None:
+        return jsonify({"error": "k must be a positive integer"}), 400
+
     try:
-        raw = request.files["tensor"].read()
-        tensor = np.load(io.BytesIO(raw))  # shape (1,224,224,3)
+        with metrics.stage("deserialize"):
+            raw = request.files["tensor"].read()
+            tensor = np.load(io.BytesIO(raw))  # shape (n,224,224,3)
+
+        return predictions_response(predict_cached(tensor), k)
 
-        predictions = model.predict(tensor, verbose=0)[0]
-        probs = predictions.tolist()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/predict/raw", methods=["POST"])
+def predict_raw():
+    """
+    Receives raw uint8 pixels (tensor_wire format, application/octet-stream),
+    streamed from the request body. Normalization happens here.
+    """
+    if not startup.ready:
+        return jsonify({"error": "Model not ready (still loading, or failed to load)"}), 503
 
-        results = []
-        for idx, probability in enumerate(probs):
-            label_info = labels_map.get(idx, {})
-            results.append({
-                "index": idx,
-                "probability": float(probability),
-                "plant": label_info.get("plant"),
-                "disease": label_info.get("disease"),
-                "healthy": label_info.get("healthy", False)
-            })
+    if request.mimetype != "application/octet-stream":
+        return jsonify({"error": "Expected application/octet-stream"}), 415
 
-        top_3 = sorted(results, key=lambda x: x["probability"], reverse=True)[:3]
+    k = parse_top_k()
+    if k is None:
+        return jsonify({"error": "k must be a positive integer"}), 400
 
-        return jsonify({"predictions": top_3})
+    try:
+        with metrics.stage("deserialize"):
+            pixels = read_pixels(request.stream, MAX_TENSOR_IMAGES)  # shape (n,224,224,3), uint8
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        # Cache is keyed on the uint8 pixels, so hits skip normalization too
+        return predictions_response(predict_cached(pixels, normalize_pixels), k)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({
+        "cache": cache.stats() if cache is not None else None,
+        "runtime": runtime_info,
+        "startup": startup.report()
+    })
+
+def load_and_start():
+    load_model_resources()
+    start_worker()
+
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5001)
+    # Several replicas on one host: PORT=5002 python inference_api_machineB.py
+    # Production: gunicorn -c gunicorn_machineB.py wsgi_machineB:app
+    threading.Thread(target=load_and_start, name="model-loader", daemon=True).start()
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", "5001")), threaded=True)
@@ -0,0 +1,131 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class NoReplicaAvailable(Exception):
+    pass
+
+
+class Replica:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.outstanding = 0
+        self.healthy = True
+        self.requests = 0
+        self.failures = 0
+
+
+class ReplicaPool:
+    """
+    Machine B replicas behind one keep-alive requests.Session.
+    - post() sends to the healthy replica with the fewest requests in flight
+      and fails over to the next one when it can't connect; a read timeout
+      (B is still running the inference) is raised instead of re-sent
+    - a background thread GETs /health on every replica each health_interval
+      seconds and takes failing ones out of rotation until they recover
+    - submit() runs post() on a thread pool for fan-out across replicas
+    """
+
+    def __init__(self, base_urls, connect_timeout=2.0, read_timeout=30.0,
+                 health_interval=5.0, max_connections=32):
+        if not base_urls:
+            raise ValueError("At least one inference replica URL is required")
+        self.replicas = [Replica(url) for url in base_urls]
+        self.timeout = (connect_timeout, read_timeout)
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._next = 0
+
+        # One connection pool per replica host, reused across requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.replicas), pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="fan-out")
+        if health_interval:
+            threading.Thread(target=self._health_loop, name="replica-health", daemon=True).start()
+
+    def _acquire(self, exclude):
+        with self._lock:
+            candidates = [r for r in self.replicas if r not in exclude and r.healthy]
+            if not candidates:
+                # Nothing marked healthy: still try the ones not attempted yet
+                candidates = [r for r in self.replicas if r not in exclude]
+            if not candidates:
+                return None
+            # Least outstanding; rotate the start so ties spread round-robin
+            self._next = (self._next + 1) % len(candidates)
+            rotated = candidates[self._next:] + candidates[:self._next]
+            replica = min(rotated, key=lambda r: r.outstanding)
+            replica.outstanding += 1
+            replica.requests += 1
+            return replica
+
+    def _release(self, replica, failed=False):
+        with self._lock:
+            replica.outstanding -= 1
+            if failed:
+                replica.failures += 1
+                replica.healthy = False
+
+    def post(self, path, **kwargs):
+        """POST to path on the least-loaded replica; returns the requests.Response."""
+        kwargs.setdefault("timeout", self.timeout)
+        tried = []
+        while True:
+            replica = self._acquire(tried)
+            if replica is None:
+                raise NoReplicaAvailable(f"All {len(self.replicas)} inference replicas failed")
+            tried.append(replica)
+            try:
+                response = self.session.post(replica.base_url + path, **kwargs)
+            except requests.ReadTimeout:
+                # B accepted the request and is still working on it: another
+                # replica would run the same inference again
+                self._release(replica)
+                raise
+            except requests.ConnectionError:
+                # Includes ConnectTimeout: the request never reached B
+                self._release(replica, failed=True)
+                # Streams can't be re-sent; bytes payloads can
+                if hasattr(kwargs.get("data"), "read"):
+                    raise
+                continue
+            self._release(replica)
+            return response
+
+    def submit(self, path, **kwargs):
+        """post() in the background; returns a Future."""
+        return self._executor.submit(self.post, path, **kwargs)
+
+    def check_health(self):
+        for replica in self.replicas:
+            try:
+                ok = self.session.get(replica.base_url + "/health", timeout=self.timeout).ok
+            except requests.RequestException:
+                ok = False
+            with self._lock:
+                replica.healthy = ok
+
+    def _health_loop(self):
+        while True:
+            self.check_health()
+            time.sleep(self.health_interval)
+
+    def status(self):
+        with self._lock:
+            return [
+                {
+                    "url": r.base_url,
+                    "healthy": r.healthy,
+                    "outstanding": r.outstanding,
+                    "requests": r.requests,
+                    "failures": r.failures,
+                }
+                for r in self.replicas
+            ]
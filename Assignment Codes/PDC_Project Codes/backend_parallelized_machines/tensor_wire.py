@@ -0,0 +1,109 @@
+import struct
+import zlib
+
+import numpy as np
+
+# Wire format for machine A -> machine B (Content-Type: application/octet-stream)
+#   4 bytes  magic b"PXL1"
+#   1 byte   flags (bit 0: payload is zlib-compressed)
+#   1 byte   ndim
+#   ndim x   uint32 little-endian dimensions, e.g. (n, 224, 224, 3)
+#   payload  raw uint8 pixels in C order
+# Normalization (/ 255.0) happens on machine B, so the payload is 4x smaller
+# than the float32 .npy upload.
+MAGIC = b"PXL1"
+FLAG_ZLIB = 0x01
+IMAGE_SHAPE = (224, 224, 3)
+# Largest n read_pixels accepts by default; the header is untrusted input
+MAX_IMAGES = 64
+_PREFIX = struct.Struct("<4sBB")
+
+
+def encode_pixels(pixels, compress=False):
+    """uint8 array -> header + payload bytes"""
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    payload = pixels.tobytes()
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload, 1)
+        flags |= FLAG_ZLIB
+    header = _PREFIX.pack(MAGIC, flags, pixels.ndim) + struct.pack(f"<{pixels.ndim}I", *pixels.shape)
+    return header + payload
+
+
+def _read_exact(stream, n):
+    # Socket-backed streams may return short reads
+    data = b""
+    while len(data) < n:
+        chunk = stream.read(n - len(data))
+        if not chunk:
+            raise ValueError("Truncated tensor header")
+        data += chunk
+    return data
+
+
+def _check_shape(shape, max_images):
+    if len(shape) != 4 or tuple(shape[1:]) != IMAGE_SHAPE:
+        raise ValueError(f"Expected shape (n, {', '.join(map(str, IMAGE_SHAPE))}), got {tuple(shape)}")
+    if not 1 <= shape[0] <= max_images:
+        raise ValueError(f"Expected 1 to {max_images} images, got {shape[0]}")
+
+
+def _has_more(stream, inflater, chunk_size):
+    """True if the body holds pixel data past the declared shape."""
+    if inflater is None:
+        return bool(stream.read(1))
+    if inflater.unconsumed_tail or inflater.decompress(b"", 1):
+        return True
+    while not inflater.eof:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return False
+        if inflater.decompress(chunk, 1):
+            return True
+    return bool(inflater.unused_data or stream.read(1))
+
+
+def read_pixels(stream, max_images=MAX_IMAGES, chunk_size=64 * 1024):
+    """
+    Parse the wire format from a file-like stream (e.g. request.stream)
+    straight into a preallocated uint8 array; the body is never buffered whole.
+    The header is checked (shape (n, 224, 224, 3), n <= max_images) before
+    anything is allocated, and the payload must match it exactly; any
+    malformed input raises ValueError.
+    """
+    magic, flags, ndim = _PREFIX.unpack(_read_exact(stream, _PREFIX.size))
+    if magic != MAGIC:
+        raise ValueError("Not a PXL1 tensor")
+    if ndim != 4:
+        raise ValueError(f"Expected a 4-d tensor, got {ndim} dimensions")
+    shape = struct.unpack(f"<{ndim}I", _read_exact(stream, 4 * ndim))
+    _check_shape(shape, max_images)
+
+    pixels = np.empty(shape, dtype=np.uint8)
+    view = memoryview(pixels.reshape(-1))
+    filled = 0
+    inflater = zlib.decompressobj() if flags & FLAG_ZLIB else None
+
+    try:
+        while filled < len(view):
+            remaining = len(view) - filled
+            if inflater is not None and inflater.unconsumed_tail:
+                # Input zlib held back last time because of the max_length limit
+                chunk = inflater.unconsumed_tail
+            else:
+                chunk = stream.read(chunk_size if inflater is not None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+            if inflater is not None:
+                chunk = inflater.decompress(chunk, remaining)
+            view[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+
+        if filled != len(view):
+            raise ValueError(f"Expected {len(view)} pixel bytes, got {filled}")
+        if _has_more(stream, inflater, chunk_size):
+            raise ValueError(f"Payload is longer than {len(view)} pixel bytes")
+    except zlib.error as e:
+        raise ValueError(f"Corrupt zlib payload: {e}") from None
+    return pixels
@@ -0,0 +1,11 @@
+"""
+Production entry point for machine B:
+
+    gunicorn -c gunicorn_machineB.py wsgi_machineB:app
+
+Imported once in the gunicorn master with preload_app (workers share the
+model through fork), otherwise once per worker.
+"""
+from inference_api_machineB import app, load_model_resources
+
+load_model_resources()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The Flask apps import their helpers as top-level modules (run from their own directory)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for name in ("backend_parallelized_machines", "backend"):
+    sys.path.insert(0, os.path.join(ROOT, name))
@@ -0,0 +1,73 @@
+import datetime
+import io
+import json
+from concurrent.futures import Future
+
+import pytest
+import requests
+from PIL import Image
+
+import app_machineA
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), (0, 128, 0)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def b_response(status, body):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body if isinstance(body, bytes) else json.dumps(body).encode()
+    response.elapsed = datetime.timedelta(milliseconds=5)
+    return response
+
+
+@pytest.fixture
+def machine_b(monkeypatch):
+    """Queue of machine B responses, answered in send order"""
+    answers = []
+
+    def send(pixels, params):
+        future = Future()
+        future.set_result(answers.pop(0))
+        return future
+
+    monkeypatch.setattr(app_machineA, "send_to_machine_b", send)
+    return answers
+
+
+def post_images(n):
+    client = app_machineA.app.test_client()
+    files = [(io.BytesIO(png_bytes()), f"leaf{i}.png") for i in range(n)]
+    return client.post("/predict", data={"file": files}, content_type="multipart/form-data")
+
+
+def test_undecodable_upload_is_a_400():
+    client = app_machineA.app.test_client()
+    response = client.post("/predict", data={"file": (io.BytesIO(b"not an image"), "notes.txt")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 400
+    assert "notes.txt" in response.get_json()["error"]
+
+
+def test_machine_b_errors_are_reported_per_file(machine_b):
+    machine_b += [
+        b_response(200, {"predictions": [{"index": 0}]}),
+        b_response(503, {"error": "Model not ready"}),
+        b_response(502, b"<html>Bad Gateway</html>"),
+    ]
+    response = post_images(3)
+    assert response.status_code == 200
+    batch = response.get_json()["batch"]
+    assert batch[0] == {"filename": "leaf0.png", "predictions": [{"index": 0}]}
+    assert batch[1] == {"filename": "leaf1.png", "error": "Model not ready"}
+    assert batch[2]["filename"] == "leaf2.png" and "HTTP 502" in batch[2]["error"]
+
+
+def test_single_non_json_error_keeps_b_status(machine_b):
+    machine_b.append(b_response(504, b"gateway timeout"))
+    response = post_images(1)
+    assert response.status_code == 504
+    assert "without a JSON body" in response.get_json()["error"]
@@ -0,0 +1,62 @@
+import io
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import inference_api_machineB as machine_b
+from tensor_wire import encode_pixels
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(machine_b.startup, "ready", False)
+    return machine_b.app.test_client()
+
+
+def test_predict_is_503_until_ready(client):
+    response = client.post("/predict", data={"tensor": (io.BytesIO(b""), "tensor.npy")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 503
+
+
+def test_predict_raw_is_503_until_ready(client):
+    body = encode_pixels(np.zeros((1, 224, 224, 3), dtype=np.uint8))
+    response = client.post("/predict/raw", data=body, content_type="application/octet-stream")
+    assert response.status_code == 503
+
+
+@pytest.fixture
+def fresh_state(monkeypatch):
+    for name in ("model", "labels_map", "label_table", "cache", "lite_model", "loaded_pid"):
+        monkeypatch.setattr(machine_b, name, None)
+    monkeypatch.setattr(machine_b.startup, "ready", False)
+
+
+def test_failed_model_load_skips_start_up(fresh_state, monkeypatch):
+    def load_model(path):
+        raise OSError(f"No file {path}")
+
+    tf = type(sys)("tensorflow")
+    tf.keras = SimpleNamespace(models=SimpleNamespace(load_model=load_model))
+    monkeypatch.setitem(sys.modules, "tensorflow", tf)
+
+    machine_b.load_model_resources()
+    assert machine_b.model is None
+    assert machine_b.label_table  # labels still load
+
+    machine_b.start_worker()
+    assert not machine_b.startup.ready
+
+
+def test_failed_warm_up_is_not_ready(fresh_state, monkeypatch):
+    def run_model(batch):
+        raise RuntimeError("bad kernel")
+
+    monkeypatch.setattr(machine_b, "model", object())
+    monkeypatch.setattr(machine_b, "label_table", [])
+    monkeypatch.setattr(machine_b, "run_model", run_model)
+
+    machine_b.start_worker()
+    assert not machine_b.startup.ready
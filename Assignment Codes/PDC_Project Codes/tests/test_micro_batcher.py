@@ -0,0 +1,66 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+class RecordingModel:
+    """predict_fn that records batch sizes and returns each row's id as its 'probability'"""
+
+    def __init__(self, gate=None):
+        self.sizes = []
+        self.gate = gate
+
+    def __call__(self, batch):
+        if self.gate is not None:
+            self.gate.wait()
+        self.sizes.append(len(batch))
+        return batch[:, :1].astype(np.float32)
+
+
+def rows(start, n):
+    return np.arange(start, start + n, dtype=np.float32).reshape(n, 1)
+
+
+def test_batches_never_exceed_max_batch_size():
+    gate = threading.Event()
+    model = RecordingModel(gate)
+    batcher = MicroBatcher(model, max_batch_size=16, max_wait_ms=50)
+    # Five 10-image requests queued while the model is blocked
+    futures = [batcher.submit(rows(i * 10, 10)) for i in range(5)]
+    gate.set()
+    for i, future in enumerate(futures):
+        np.testing.assert_array_equal(future.result(timeout=5), rows(i * 10, 10))
+    assert max(model.sizes) <= 16
+    assert sum(model.sizes) == 50
+
+
+def test_oversized_request_is_split_and_reassembled():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=1)
+    result = batcher.predict(rows(0, 21), timeout=5)
+    np.testing.assert_array_equal(result, rows(0, 21))
+    assert model.sizes and max(model.sizes) <= 8
+    assert batcher.stats()["images"] == 21
+
+
+def test_concurrent_requests_get_their_own_rows():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=16, max_wait_ms=5)
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda i: batcher.predict(rows(i * 100, 1 + i % 5), timeout=5), range(40)))
+    for i, result in enumerate(results):
+        np.testing.assert_array_equal(result, rows(i * 100, 1 + i % 5))
+    assert max(model.sizes) <= 16
+
+
+def test_model_error_reaches_every_chunk():
+    def broken(batch):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(broken, max_batch_size=4, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        batcher.predict(rows(0, 10), timeout=5)
@@ -0,0 +1,80 @@
+import numpy as np
+
+import prediction_cache
+from prediction_cache import PredictionCache
+
+
+def test_lru_eviction():
+    cache = PredictionCache(max_entries=2)
+    for name in ("a", "b"):
+        cache.put(name, np.array([1.0]))
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    cache.put("c", np.array([2.0]))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, "time", lambda: now[0])
+    cache = PredictionCache(ttl=10)
+    cache.put("a", np.array([1.0]))
+    now[0] += 5
+    assert cache.get("a") is not None
+    now[0] += 6
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    first = PredictionCache(disk_dir=str(tmp_path), namespace="model-1")
+    key = first.key(np.zeros((2, 2), dtype=np.uint8))
+    first.put(key, np.array([0.25, 0.75]))
+
+    second = PredictionCache(disk_dir=str(tmp_path), namespace="model-1")
+    np.testing.assert_array_equal(second.get(key), [0.25, 0.75])
+    assert second.stats()["disk_hits"] == 1
+
+
+def test_namespace_changes_the_key():
+    data = b"same image bytes"
+    assert PredictionCache(namespace="a").key(data) != PredictionCache(namespace="b").key(data)
+    assert PredictionCache(namespace="a").key(data) == PredictionCache(namespace="a").key(data)
+
+
+def test_put_keeps_its_own_copy():
+    batch = np.ones((4, 3))
+    cache = PredictionCache()
+    cache.put("row", batch[1])
+    batch[1] = 0
+    np.testing.assert_array_equal(cache.get("row"), [1, 1, 1])
+
+
+def test_failed_disk_write_keeps_the_prediction(tmp_path, monkeypatch):
+    cache = PredictionCache(disk_dir=str(tmp_path))
+
+    def full_disk(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(prediction_cache.np, "save", full_disk)
+    cache.put("a", np.array([0.5, 0.5]))
+
+    np.testing.assert_array_equal(cache.get("a"), [0.5, 0.5])
+    assert cache.stats()["disk_errors"] == 1
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_disk_hit_expires_with_its_original_age(tmp_path, monkeypatch):
+    cache = PredictionCache(ttl=10, disk_dir=str(tmp_path))
+    cache.put("a", np.array([1.0]))
+    stored_at = next(tmp_path.rglob("*.npy")).stat().st_mtime
+
+    # A fresh cache (e.g. after a restart) finds the entry on disk 6 s later...
+    now = [stored_at + 6]
+    monkeypatch.setattr(prediction_cache.time, "time", lambda: now[0])
+    restarted = PredictionCache(ttl=10, disk_dir=str(tmp_path))
+    assert restarted.get("a") is not None
+    # ...and it still expires 10 s after it was written, not 10 s after the hit
+    now[0] = stored_at + 11
+    assert restarted.get("a") is None
@@ -0,0 +1,55 @@
+import pytest
+import requests
+
+from replica_pool import NoReplicaAvailable, ReplicaPool
+
+
+class FakeSession:
+    """Session.post stand-in: raises or answers per replica URL"""
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.calls = []
+
+    def post(self, url, **kwargs):
+        self.calls.append(url)
+        outcome = next(v for base, v in self.outcomes.items() if url.startswith(base + "/"))
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def make_pool(outcomes):
+    pool = ReplicaPool(list(outcomes), health_interval=0)
+    pool.session = FakeSession(outcomes)
+    return pool
+
+
+def by_url(pool):
+    return {r["url"]: r for r in pool.status()}
+
+
+@pytest.mark.parametrize("error", [requests.ConnectionError("refused"), requests.ConnectTimeout("slow connect")])
+def test_fails_over_when_the_request_never_reached_b(error):
+    pool = make_pool({"http://b1": error, "http://b2": "ok"})
+    pool._next = len(pool.replicas) - 1  # try b1 first
+    assert pool.post("/predict/raw", data=b"x") == "ok"
+    status = by_url(pool)
+    assert not status["http://b1"]["healthy"] and status["http://b1"]["failures"] == 1
+    assert all(r["outstanding"] == 0 for r in status.values())
+
+
+def test_read_timeout_is_not_resent_or_marked_unhealthy():
+    pool = make_pool({"http://b1": requests.ReadTimeout("still running"), "http://b2": "ok"})
+    pool._next = len(pool.replicas) - 1
+    with pytest.raises(requests.ReadTimeout):
+        pool.post("/predict/raw", data=b"x")
+    assert pool.session.calls == ["http://b1/predict/raw"]
+    status = by_url(pool)
+    assert status["http://b1"]["healthy"] and status["http://b1"]["outstanding"] == 0
+
+
+def test_all_replicas_down():
+    pool = make_pool({"http://b1": requests.ConnectionError(), "http://b2": requests.ConnectionError()})
+    with pytest.raises(NoReplicaAvailable):
+        pool.post("/predict/raw", data=b"x")
@@ -0,0 +1,80 @@
+import io
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from tensor_wire import FLAG_ZLIB, MAGIC, encode_pixels, read_pixels
+
+
+def pixels(n):
+    return np.random.default_rng(n).integers(0, 256, size=(n, 224, 224, 3), dtype=np.uint8)
+
+
+def header(shape, flags=0):
+    return struct.pack("<4sBB", MAGIC, flags, len(shape)) + struct.pack(f"<{len(shape)}I", *shape)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(compress):
+    sent = pixels(3)
+    received = read_pixels(io.BytesIO(encode_pixels(sent, compress)), chunk_size=4096)
+    assert received.dtype == np.uint8
+    np.testing.assert_array_equal(received, sent)
+
+
+def test_bad_magic():
+    with pytest.raises(ValueError, match="PXL1"):
+        read_pixels(io.BytesIO(b"NOPE" + encode_pixels(pixels(1))[4:]))
+
+
+def test_truncated_header():
+    with pytest.raises(ValueError, match="header"):
+        read_pixels(io.BytesIO(encode_pixels(pixels(1))[:9]))
+
+
+@pytest.mark.parametrize("shape", [(1, 224, 224), (1, 32, 32, 3), (1, 224, 224, 4), (0, 224, 224, 3)])
+def test_bad_shape(shape):
+    with pytest.raises(ValueError):
+        read_pixels(io.BytesIO(header(shape)))
+
+
+def test_oversized_batch_rejected_before_allocating():
+    # 2**32 - 1 images would be ~150 TB; must fail on the header alone
+    with pytest.raises(ValueError, match="images"):
+        read_pixels(io.BytesIO(header((2**32 - 1, 224, 224, 3))))
+    with pytest.raises(ValueError, match="images"):
+        read_pixels(io.BytesIO(encode_pixels(pixels(3))), max_images=2)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_truncated_payload(compress):
+    payload = pixels(1).tobytes()[:-10]
+    if compress:
+        payload = zlib.compress(payload)
+    body = header((1, 224, 224, 3), FLAG_ZLIB if compress else 0) + payload
+    with pytest.raises(ValueError, match="pixel bytes"):
+        read_pixels(io.BytesIO(body))
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_payload_longer_than_shape(compress):
+    payload = pixels(2).tobytes()
+    if compress:
+        payload = zlib.compress(payload)
+    body = header((1, 224, 224, 3), FLAG_ZLIB if compress else 0) + payload
+    with pytest.raises(ValueError, match="longer"):
+        read_pixels(io.BytesIO(body))
+
+
+def test_trailing_bytes_after_zlib_stream():
+    body = encode_pixels(pixels(1), compress=True) + b"junk"
+    with pytest.raises(ValueError, match="longer"):
+        read_pixels(io.BytesIO(body))
+
+
+def test_corrupt_zlib_payload():
+    body = header((1, 224, 224, 3), FLAG_ZLIB) + b"\x00" * 64
+    with pytest.raises(ValueError, match="zlib"):
+        read_pixels(io.BytesIO(body))
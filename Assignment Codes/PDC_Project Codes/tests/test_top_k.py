@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import app
+import app_machineA
+import inference_api_machineB
+from image_pipeline import mobilenet_normalize_into
+from top_k import parse_top_k, top_k, top_k_predictions
+
+
+@pytest.mark.parametrize("service", [app, app_machineA, inference_api_machineB], ids=lambda m: m.__name__)
+def test_services_share_top_k(service):
+    assert service.parse_top_k is parse_top_k
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("", 3),
+    ("?k=1", 1),
+    ("?k=10", 10),
+    ("?k=abc", None),
+    ("?k=", None),
+    ("?k=0", None),
+    ("?k=-2", None),
+    ("?k=2.5", None),
+])
+def test_parse_top_k(query, expected):
+    with app.app.test_request_context("/predict" + query):
+        assert parse_top_k() == expected
+
+
+@pytest.mark.parametrize("k", [1, 3, 7, 50])
+def test_top_k_matches_full_sort(k):
+    probs = np.random.default_rng(k).random((5, 7)).astype(np.float32)
+    idx, top = top_k(probs, k)
+    expected = np.argsort(-probs, axis=1)[:, :k]
+    np.testing.assert_array_equal(idx, expected)
+    np.testing.assert_array_equal(top, np.take_along_axis(probs, expected, axis=1))
+
+
+def test_top_k_predictions_attach_labels():
+    labels = [{"plant": f"p{i}"} for i in range(4)]
+    probs = np.array([[0.1, 0.5, 0.3, 0.1]], dtype=np.float32)
+    (row,) = top_k_predictions(probs, 2, labels)
+    assert [p["index"] for p in row] == [1, 2]
+    assert row[0]["plant"] == "p1"
+    assert row[0]["probability"] == pytest.approx(0.5)
+
+
+def test_mobilenet_normalize_matches_preprocess_input():
+    pixels = np.arange(256, dtype=np.uint8).reshape(1, 16, 16, 1)
+    out = mobilenet_normalize_into(pixels, np.empty(pixels.shape, dtype=np.float32))
+    np.testing.assert_allclose(out, pixels / 127.5 - 1.0, atol=1e-6)
+    assert out.min() == -1.0 and out.max() == 1.0
@@ -0,0 +1,80 @@
+# bench_tokenizer.py
+"""
+Tokenizer Micro-benchmark
+-------------------------
+Compares reviews/sec of the original per-review clean_text (stopword set
+rebuilt on every call, list per review) with every text_tokenizer backend
+(python: batch tokenization into a Counter, vectorized: pandas column ops).
+
+Usage: python bench_tokenizer.py [--limit 20000] [--repeat 3]
+"""
+
+import argparse
+import string
+import time
+from collections import Counter
+from nltk.corpus import stopwords
+from review_reader import iter_review_batches
+from text_tokenizer import BACKENDS, make_tokenizer
+
+
+def clean_text(text):
+    """Original seq_text_analysis.clean_text, kept as the reference."""
+    stop_words = set(stopwords.words('english'))
+    text = text.lower()
+    text = text.translate(str.maketrans('', '', string.punctuation))
+    words = text.split()
+    words = [w for w in words if w not in stop_words]
+    return words
+
+
+def run_clean_text(batches):
+    counter = Counter()
+    for batch in batches:
+        for review in batch:
+            if isinstance(review, str):
+                counter.update(clean_text(review))
+    return counter
+
+
+def run_tokenizer(batches, tokenizer):
+    counter = Counter()
+    for batch in batches:
+        tokenizer.count_batch(batch, counter)
+    return counter
+
+
+def best_of(repeat, fn, *args):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenizer micro-benchmark")
+    parser.add_argument("--limit", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Load once so only tokenization is timed
+    batches = list(iter_review_batches("reviews.csv", limit=args.limit))
+    n_reviews = sum(len(b) for b in batches)
+
+    old_time, old_counts = best_of(args.repeat, run_clean_text, batches)
+    print(f"Reviews: {n_reviews} (best of {args.repeat})")
+    print(f"{'clean_text':<12}: {old_time:.3f}s  {n_reviews / old_time:,.0f} reviews/sec")
+
+    for backend in sorted(BACKENDS):
+        tokenizer = make_tokenizer(backend)
+        new_time, new_counts = best_of(args.repeat, run_tokenizer, batches, tokenizer)
+        same_top = new_counts.most_common(20) == old_counts.most_common(20)
+        print(f"{backend:<12}: {new_time:.3f}s  {n_reviews / new_time:,.0f} reviews/sec  "
+              f"speedup {old_time / new_time:.1f}x  counts match: {new_counts == old_counts}  "
+              f"top-20 match: {same_top}")
+
+
+if __name__ == "__main__":
+    main()
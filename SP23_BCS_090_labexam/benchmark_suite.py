@@ -0,0 +1,197 @@
+# benchmark_suite.py
+"""
+Scaling Benchmark Suite
+-----------------------
+Runs every text-analysis engine on the same input and writes one tidy
+results file, so speedups are measured rather than hard-coded.
+
+1. For each input size, seq_text_analysis.py is timed first (the baseline)
+2. parallel_text_analysis.py runs once per worker count (--workers p),
+   mpi_text_analysis.py and hybrid_text_pipeline.py once per rank count
+   (mpiexec -n p)
+3. Every configuration gets --warmup untimed runs, then --repeat timed runs
+4. One row per (engine, size, workers): median engine-reported time,
+   speedup and efficiency vs seq, Karp-Flatt serial fraction and peak RSS
+
+Time is the figure each engine prints (start of counting to result);
+wall_s also includes interpreter start-up and imports. Peak RSS is the
+largest single process of the run (os.wait4 rusage; not on Windows).
+The hybrid engine counts only its sentiment-filtered share of the reviews,
+so its speedup is against the full sequential pass.
+
+Usage: python benchmark_suite.py [--sizes 5000 20000] [--workers 1 2 4 8]
+       [--engines mp mpi hybrid] [--repeat 3] [--warmup 1] [--plot speedup_graph.png]
+"""
+
+import argparse
+import os
+import re
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+from review_reader import DEFAULT_LIMIT
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# engine -> (script, regex for the time it prints, launched with mpiexec)
+ENGINES = {
+    "seq": ("seq_text_analysis.py", r"Processed \d+ reviews in ([\d.]+) seconds", False),
+    "mp": ("parallel_text_analysis.py", r"\d+ workers -> Time: ([\d.]+)s", False),
+    "mpi": ("mpi_text_analysis.py", r"Total distributed time: ([\d.]+)s", True),
+    "hybrid": ("hybrid_text_pipeline.py", r"Hybrid total time: ([\d.]+)s", True),
+}
+
+COLUMNS = ["engine", "size", "workers", "reps", "time_s", "time_min_s", "wall_s",
+           "speedup", "efficiency", "karp_flatt", "peak_rss_mb"]
+
+
+def engine_command(engine, size, workers, args):
+    script, _, use_mpi = ENGINES[engine]
+    cmd = [sys.executable, os.path.join(HERE, script), "--limit", str(size)]
+    cmd += shlex.split(getattr(args, f"{engine}_args"))
+    if engine == "mp":
+        cmd += ["--workers", str(workers)]
+    if use_mpi:
+        cmd = shlex.split(args.mpiexec) + ["-n", str(workers)] + cmd
+    return cmd
+
+
+def run_once(cmd):
+    """Run cmd; return (stdout text, wall seconds, peak RSS in MB or None)."""
+    with tempfile.TemporaryFile() as out:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=out, stderr=subprocess.STDOUT)
+        if hasattr(os, "wait4"):
+            # wait4 reaps the child itself and returns its rusage
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+            peak_mb = usage.ru_maxrss / scale
+        else:
+            proc.wait()
+            peak_mb = None
+        wall = time.perf_counter() - start
+        out.seek(0)
+        text = out.read().decode("utf-8", "replace")
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} exited with {proc.returncode}:\n{text[-2000:]}")
+    return text, wall, peak_mb
+
+
+def measure(engine, size, workers, args):
+    """Warm-up runs, then --repeat timed runs of one configuration."""
+    cmd = engine_command(engine, size, workers, args)
+    pattern = re.compile(ENGINES[engine][1])
+    for _ in range(args.warmup):
+        run_once(cmd)
+
+    times, walls, peaks = [], [], []
+    for _ in range(args.repeat):
+        text, wall, peak_mb = run_once(cmd)
+        found = pattern.search(text)
+        if found is None:
+            raise RuntimeError(f"No timing line in the output of {' '.join(cmd)}:\n{text[-2000:]}")
+        times.append(float(found.group(1)))
+        walls.append(wall)
+        if peak_mb is not None:
+            peaks.append(peak_mb)
+
+    return {
+        "engine": engine,
+        "size": size,
+        "workers": workers,
+        "reps": args.repeat,
+        "time_s": statistics.median(times),
+        "time_min_s": min(times),
+        "wall_s": statistics.median(walls),
+        "peak_rss_mb": max(peaks) if peaks else None,
+    }
+
+
+def add_scaling(row, baseline):
+    """Speedup, efficiency and Karp-Flatt serial fraction against baseline seconds."""
+    p = row["workers"]
+    # Times are printed to 0.01s, so tiny inputs can read as 0
+    speedup = baseline / row["time_s"] if row["time_s"] > 0 else float("nan")
+    row["speedup"] = speedup
+    row["efficiency"] = speedup / p
+    # e = (1/S - 1/p) / (1 - 1/p); undefined for a single worker
+    row["karp_flatt"] = (1 / speedup - 1 / p) / (1 - 1 / p) if p > 1 else float("nan")
+    return row
+
+
+def plot_speedup(df, path):
+    """Speedup vs workers per engine at the largest input size."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    largest = df[df["size"] == df["size"].max()]
+    fig, ax = plt.subplots(figsize=(6, 4))
+    for engine, group in largest[largest["engine"] != "seq"].groupby("engine"):
+        ax.plot(group["workers"], group["speedup"], marker="o", label=engine)
+    workers = sorted(largest["workers"].unique())
+    ax.plot(workers, workers, linestyle="--", color="grey", label="ideal")
+    ax.set_xlabel("Workers / ranks")
+    ax.set_ylabel("Speedup vs sequential")
+    ax.set_title(f"Speedup ({largest['size'].iloc[0]} reviews)")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scaling benchmark for all text-analysis engines")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[DEFAULT_LIMIT],
+                        help="input sizes (number of reviews)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="worker counts (mp) and rank counts (mpi, hybrid)")
+    parser.add_argument("--engines", nargs="+", choices=[e for e in ENGINES if e != "seq"],
+                        default=["mp", "mpi", "hybrid"],
+                        help="parallel engines to run; seq always runs as the baseline")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per configuration")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per configuration")
+    parser.add_argument("--mpiexec", default="mpiexec",
+                        help="MPI launcher command, e.g. 'mpiexec --oversubscribe'")
+    for engine in ENGINES:
+        parser.add_argument(f"--{engine}-args", default="",
+                            help=f"extra arguments for the {engine} engine, e.g. --{engine}-args='--backend vectorized'")
+    parser.add_argument("--out", default="benchmark_results.csv", help="tidy results file")
+    parser.add_argument("--plot", default=None, help="also draw a speedup graph (needs matplotlib)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    rows = []
+    for size in args.sizes:
+        seq = measure("seq", size, 1, args)
+        baseline = seq["time_s"]
+        rows.append(add_scaling(seq, baseline))
+        print(f"[{size} reviews] seq: {baseline:.2f}s")
+
+        for engine in args.engines:
+            for workers in args.workers:
+                row = add_scaling(measure(engine, size, workers, args), baseline)
+                rows.append(row)
+                print(f"[{size} reviews] {engine} x{workers}: {row['time_s']:.2f}s | "
+                      f"Speedup: {row['speedup']:.2f}x | Efficiency: {row['efficiency'] * 100:.1f}%")
+
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df.to_csv(args.out, index=False)
+    print(f"\nResults saved to {args.out}")
+
+    if args.plot:
+        plot_speedup(df, args.plot)
+        print(f"Speedup graph saved to {args.plot}")
+
+
+if __name__ == "__main__":
+    main()
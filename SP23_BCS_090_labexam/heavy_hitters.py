@@ -0,0 +1,79 @@
+# heavy_hitters.py
+"""
+Heavy-Hitter Sketches for Top-K
+-------------------------------
+Approximate mode for the gather phase: workers ship a bounded summary
+instead of their full vocabulary Counter.
+
+1. Each worker feeds its batches into a HeavyHitters summary (<= capacity words)
+2. The master merges the summaries; the surviving words are the candidates
+3. An exact second pass counts only the candidates (CandidateCounter)
+
+HeavyHitters is the mergeable Misra-Gries summary (the deterministic twin
+of Space-Saving): any word left out has a true count <= error_bound, so the
+exact top-K is certified when the K-th exact count is above that bound.
+"""
+
+import heapq
+from collections import Counter
+from collections.abc import Mapping
+
+
+class HeavyHitters:
+    """Misra-Gries frequent-items summary holding at most `capacity` words."""
+
+    def __init__(self, capacity=2000):
+        self.capacity = capacity
+        self.counts = Counter()
+        self.total = 0
+        self.error_bound = 0
+
+    def update(self, items):
+        """Add a mapping of counts or an iterable of words (like Counter.update)."""
+        batch = items if isinstance(items, Mapping) else Counter(items)
+        self.counts.update(batch)
+        self.total += sum(batch.values())
+        self._prune()
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.error_bound += other.error_bound
+        self._prune()
+
+    def _prune(self):
+        if len(self.counts) <= self.capacity:
+            return
+        # Subtract the (capacity+1)-th largest count from everyone
+        cut = heapq.nlargest(self.capacity + 1, self.counts.values())[-1]
+        self.error_bound += cut
+        self.counts = Counter({w: c - cut for w, c in self.counts.items() if c > cut})
+
+    def candidates(self):
+        return frozenset(self.counts)
+
+
+class CandidateCounter(Counter):
+    """Counter that only keeps words from a fixed candidate set (exact pass)."""
+
+    def __init__(self, candidates):
+        self.candidates = frozenset(candidates)
+        super().__init__()
+
+    def update(self, iterable=None, **kwds):
+        if isinstance(iterable, Mapping):
+            iterable = {w: c for w, c in iterable.items() if w in self.candidates}
+        elif iterable is not None:
+            iterable = filter(self.candidates.__contains__, iterable)
+        super().update(iterable, **kwds)
+
+    def to_counter(self):
+        """Plain Counter for pickling back to the master."""
+        return Counter(dict(self))
+
+
+def certified_top(counter, k, error_bound):
+    """(top-k list, True if no word outside the candidates could be in it)."""
+    top = counter.most_common(k)
+    certified = error_bound == 0 or (len(top) == k and top[-1][1] > error_bound)
+    return top, certified
@@ -4,45 +4,54 @@ Hybrid Parallel NLP Pipeline (MPI + multiprocessing)
 - Rank 0: Positive sentiment
 - Rank 1: Negative sentiment
 - Other ranks: All reviews
+Rank i owns the i-th contiguous block of the first --limit rows (a byte
+range of reviews.csv, as in --sharded) and seeks to it and parses only
+that block, batch by batch.
+--backend vectorized: pool workers count with pandas column ops.
+--encoded: counts travel as NumPy arrays over a shared vocabulary
+(pool -> rank by array sum, ranks -> rank 0 by comm.Gather on buffers).
+--dynamic: master/worker task queue instead of fixed roles per rank.
+Rank 0 streams the same blocks, cuts them into small tasks tagged with
+their block's role and hands the next task to whichever rank asks first,
+so no rank waits on the slowest partition.
+--profile PREFIX: every rank samples its own CPU / memory / IO (and its pool
+workers') into PREFIX.rank<N>.csv / .json / .trace.json (resource_profiler.py).
 """
 
 from mpi4py import MPI
+import argparse
+import heapq
+import numpy as np
 import pandas as pd
-import string
 import time
 from collections import Counter
+from contextlib import nullcontext
 from multiprocessing import Pool, cpu_count
-from nltk.corpus import stopwords
-import nltk
 import os
-import sys
+from resource_profiler import profiler_for
+from review_reader import DEFAULT_LIMIT, byte_ranges, iter_range_batches, limit_offset, split_into_n
+from text_tokenizer import BACKENDS, make_tokenizer
+from vocab_counts import COUNT_DTYPE, merge_encoded, seed_vocabulary
 
-# Download NLTK stopwords silently
-nltk.download('stopwords', quiet=True)
-STOP_WORDS = set(stopwords.words('english'))
+# Built once per pool worker by init_worker (stopwords + punctuation table)
+TOKENIZER = None
+VOCAB = None
+
+ROLES = ("positive", "negative", "all")
+TAG_READY = 1  # worker -> master: send me the next task
+TAG_TASK = 2   # master -> worker: (role, texts), or None when done
 
 # ---------- Utility Functions ----------
 
-def clean_text_to_words(text):
-    """Lowercase, remove punctuation, remove stopwords"""
-    if not isinstance(text, str):
-        return []
-    s = text.lower()
-    s = s.translate(str.maketrans('', '', string.punctuation))
-    words = s.split()
-    return [w for w in words if w not in STOP_WORDS and w.isalpha()]
+def init_worker(backend, vocab=None):
+    global TOKENIZER, VOCAB
+    TOKENIZER = make_tokenizer(backend, alpha_only=True)
+    VOCAB = vocab
 
 def process_sublist(texts):
-    """Process a list of texts -> word Counter"""
-    local = Counter()
-    for t in texts:
-        local.update(clean_text_to_words(t))
-    return local
-
-def split_into_n(lst, n):
-    """Split a list into n nearly equal parts"""
-    k, m = divmod(len(lst), n)
-    return [lst[i*k + min(i, m):(i+1)*k + min(i+1, m)] for i in range(n)]
+    """Process a list of texts -> word Counter (or encoded counts with a vocabulary)"""
+    counts = TOKENIZER.count_batch(texts)
+    return VOCAB.encode(counts) if VOCAB is not None else counts
 
 def safe_print(msg):
     """Avoid UnicodeEncodeError on Windows terminals"""
@@ -51,114 +60,294 @@ def safe_print(msg):
     except UnicodeEncodeError:
         print(msg.encode('ascii', 'ignore').decode())
 
-# ---------- Main Function ----------
-
-def main():
-    comm = MPI.COMM_WORLD
-    rank = comm.Get_rank()
-    size = comm.Get_size()
-
-    seq_time = 58.2  # Example sequential time for speedup calculation
+def print_speedup(baseline, total_time):
+    """Speedup against a measured sequential time (--baseline), if one was given"""
+    if baseline:
+        safe_print(f"● Hybrid speedup: {baseline / total_time:.2f}x vs Sequential")
+    else:
+        safe_print("● Hybrid speedup: pass --baseline or use benchmark_suite.py")
 
-    if rank == 0:
-        safe_print(f"\n[Hybrid Pipeline] Starting with {size} MPI processes (PID {os.getpid()})")
+def top_words(counter, n):
+    """
+    The n most frequent words, ties broken alphabetically. --dynamic merges
+    results in arrival order, so most_common() alone would order ties
+    differently from run to run.
+    """
+    return heapq.nsmallest(n, counter.items(), key=lambda wc: (-wc[1], wc[0]))
 
-        # Detect separator
-        sample = open("reviews.csv", encoding="utf-8").readline()
-        sep = "\t" if "\t" in sample else ","
-
-        # Load first 20k rows
-        try:
-            df = pd.read_csv("reviews.csv", delimiter=sep, encoding="utf-8", on_bad_lines="skip").head(20000)
-        except TypeError:
-            df = pd.read_csv("reviews.csv", delimiter=sep, encoding="utf-8", engine="python").head(20000)
-
-        # Identify score column
-        score_col = None
-        for c in df.columns:
-            if c.lower() == "score":
-                score_col = c
-                break
-        if score_col is None:
-            safe_print("ERROR: No 'Score' column found.")
-            comm.Abort(1)
-            return
+def role_texts(role, texts, scores):
+    """Keep the reviews a sentiment role counts"""
+    if role == "positive":
+        return [str(t) for t, s in zip(texts, scores) if s and s >= 4]
+    if role == "negative":
+        return [str(t) for t, s in zip(texts, scores) if s and s <= 2]
+    return [str(t) for t in texts]
 
-        reviews = [(str(t), float(s) if pd.notna(s) else None) for t, s in zip(df["Text"], df[score_col])]
-        chunks = split_into_n(reviews, size)
+def iter_tasks(ranges, data_end, task_size):
+    """Every rank's block in file order, cut into (role, texts) tasks of at most task_size reviews"""
+    for r, byte_range in enumerate(ranges):
+        role = ROLES[min(r, 2)]
+        for texts, scores in iter_range_batches(*byte_range, with_scores=True, data_end=data_end):
+            kept = role_texts(role, texts, scores)
+            for start in range(0, len(kept), task_size):
+                yield role, kept[start:start + task_size]
 
-        # Sentiment-specific filtering
-        data_parts = []
-        for i, ch in enumerate(chunks):
-            if i == 0:
-                filtered = [t for t, s in ch if s and s >= 4]  # Positive
-            elif i == 1:
-                filtered = [t for t, s in ch if s and s <= 2]  # Negative
-            else:
-                filtered = [t for t, s in ch]  # All
-            data_parts.append(filtered)
+def count_texts(p, workers, vocab, texts, counter, counts=None):
+    """Count texts on the local pool into counter (and counts when encoded)"""
+    partials = p.map(process_sublist, split_into_n(texts, workers))
+    if vocab is not None:
+        batch_counts, overflow = merge_encoded(vocab, partials)
+        counts += batch_counts
+        counter.update(overflow)
     else:
-        data_parts = None
+        for part in partials:
+            counter.update(part)
 
-    comm.Barrier()
-    start_total = time.time()
+# ---------- Static roles ----------
 
-    # Scatter
-    local_texts = comm.scatter(data_parts, root=0)
+def run_static(comm, p, workers, vocab, ranges, data_end, start_total, baseline=None):
+    """Every rank streams its own block of rows and filters it for its role"""
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    role = ROLES[min(rank, 2)]
 
-    # Local multiprocessing
-    workers = min(cpu_count(), 4)
-    local_start = time.time()
-    sublists = split_into_n(local_texts, workers)
-    with Pool(processes=workers) as p:
-        partials = p.map(process_sublist, sublists)
     local_counter = Counter()
-    for part in partials:
-        local_counter.update(part)
-    local_time = time.time() - local_start
+    local_counts = vocab.zeros() if vocab is not None else None
+    local_reviews = 0
+    local_time = 0.0
+
+    try:
+        for texts, scores in iter_range_batches(*ranges[rank], with_scores=True, data_end=data_end):
+            local_texts = role_texts(role, texts, scores)
 
+            # Local multiprocessing
+            local_start = time.time()
+            count_texts(p, workers, vocab, local_texts, local_counter, local_counts)
+            local_time += time.time() - local_start
+            local_reviews += len(local_texts)
+    except ValueError as e:
+        # No Text or Score column in the file
+        safe_print(f"ERROR: {e}")
+        comm.Abort(1)
+        return None
+
+    if vocab is not None:
+        # Fixed-size arrays go through the buffer API; local_counter is the overflow
+        all_counts = np.empty((size, len(vocab)), dtype=COUNT_DTYPE) if rank == 0 else None
+        comm.Gather(local_counts, all_counts, root=0)
     gathered_counters = comm.gather(local_counter, root=0)
     gathered_times = comm.gather(local_time, root=0)
-    gathered_counts = comm.gather(len(local_texts), root=0)
+    gathered_counts = comm.gather(local_reviews, root=0)
 
     comm.Barrier()
     total_time = time.time() - start_total
 
-    # ---------- Master Output ----------
-    if rank == 0:
-        total_reviews = sum(gathered_counts)
-        safe_print("\n===== Hybrid NLP Processing Summary =====")
-        for r in range(size):
-            role = "positive" if r == 0 else "negative" if r == 1 else "all"
-            safe_print(f"● Node {r} ({role}): processed {gathered_counts[r]} reviews in {gathered_times[r]:.2f}s")
-
-        overhead = total_time - max(gathered_times)
-        speedup = seq_time / total_time
-        safe_print(f"● Communication overhead: {overhead:.2f}s")
-        safe_print(f"● Hybrid total time: {total_time:.2f}s")
-        safe_print(f"● Hybrid speedup: {speedup:.2f}x vs Sequential")
-
-        # Merge Counters
+    if rank != 0:
+        return None
+
+    safe_print("\n===== Hybrid NLP Processing Summary =====")
+    for r in range(size):
+        role = ROLES[min(r, 2)]
+        safe_print(f"● Node {r} ({role}): processed {gathered_counts[r]} reviews in {gathered_times[r]:.2f}s")
+
+    overhead = total_time - max(gathered_times)
+    safe_print(f"● Communication overhead: {overhead:.2f}s")
+    safe_print(f"● Hybrid total time: {total_time:.2f}s")
+    print_speedup(baseline, total_time)
+
+    # Merge Counters
+    if vocab is not None:
+        pos_counter = vocab.decode(all_counts[0], gathered_counters[0])
+        neg_counter = vocab.decode(all_counts[1], gathered_counters[1]) if size > 1 else Counter()
+        total_counter = vocab.decode(all_counts.sum(axis=0), None)
+    else:
         total_counter = Counter()
         pos_counter = gathered_counters[0]
         neg_counter = gathered_counters[1] if size > 1 else Counter()
-        for c in gathered_counters:
-            total_counter.update(c)
+    for c in gathered_counters:
+        total_counter.update(c)
+    return pos_counter, neg_counter, total_counter
+
+# ---------- Dynamic task queue ----------
+
+def dispatch_tasks(comm, tasks):
+    """Master: answer every TAG_READY with the next task, then with None"""
+    status = MPI.Status()
+    for task in tasks:
+        comm.recv(source=MPI.ANY_SOURCE, tag=TAG_READY, status=status)
+        comm.send(task, dest=status.Get_source(), tag=TAG_TASK)
+    for _ in range(comm.Get_size() - 1):
+        comm.recv(source=MPI.ANY_SOURCE, tag=TAG_READY, status=status)
+        comm.send(None, dest=status.Get_source(), tag=TAG_TASK)
+
+def pull_tasks(comm):
+    """Worker: ask rank 0 for tasks until it answers None"""
+    while True:
+        comm.send(None, dest=0, tag=TAG_READY)
+        task = comm.recv(source=0, tag=TAG_TASK)
+        if task is None:
+            return
+        yield task
+
+def run_dynamic(comm, p, workers, vocab, ranges, data_end, task_size, start_total, baseline=None):
+    """Rank 0 dispatches role-tagged tasks; idle ranks pull the next one"""
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+
+    role_counters = {role: Counter() for role in ROLES}
+    role_counts = np.zeros((len(ROLES), len(vocab)), dtype=COUNT_DTYPE) if vocab is not None else None
+    local_reviews = 0
+    local_tasks = 0
+    local_time = 0.0
+
+    if rank == 0:
+        tasks = iter_tasks(ranges, data_end, task_size)
+        if size > 1:
+            try:
+                dispatch_tasks(comm, tasks)
+            except ValueError as e:
+                # No Text or Score column in the file
+                safe_print(f"ERROR: {e}")
+                comm.Abort(1)
+                return None
+            tasks = ()
+    else:
+        tasks = pull_tasks(comm)
+
+    # Single process: rank 0 works through the queue itself
+    try:
+        for role, texts in tasks:
+            i = ROLES.index(role)
+            local_start = time.time()
+            count_texts(p, workers, vocab, texts, role_counters[role],
+                        role_counts[i] if vocab is not None else None)
+            local_time += time.time() - local_start
+            local_reviews += len(texts)
+            local_tasks += 1
+    except ValueError as e:
+        safe_print(f"ERROR: {e}")
+        comm.Abort(1)
+        return None
+
+    if vocab is not None:
+        # (roles x vocab) arrays summed over ranks; role_counters hold the overflow
+        total_counts = np.empty_like(role_counts) if rank == 0 else None
+        comm.Reduce(role_counts, total_counts, op=MPI.SUM, root=0)
+    gathered_counters = comm.gather(role_counters, root=0)
+    gathered_times = comm.gather(local_time, root=0)
+    gathered_counts = comm.gather((local_tasks, local_reviews), root=0)
+
+    comm.Barrier()
+    total_time = time.time() - start_total
+
+    if rank != 0:
+        return None
+
+    safe_print("\n===== Hybrid NLP Processing Summary (dynamic) =====")
+    for r in range(size):
+        n_tasks, n_reviews = gathered_counts[r]
+        who = "master" if r == 0 and size > 1 else "worker"
+        safe_print(f"● Node {r} ({who}): {n_tasks} tasks, {n_reviews} reviews in {gathered_times[r]:.2f}s")
+
+    busy = gathered_times[1:] if size > 1 else gathered_times
+    mean_busy = sum(busy) / len(busy)
+    imbalance = max(busy) / mean_busy if mean_busy else 1.0
+    safe_print(f"● Worker busy time: mean {mean_busy:.2f}s, max {max(busy):.2f}s (imbalance {imbalance:.2f}x)")
+    safe_print(f"● Communication overhead: {total_time - mean_busy:.2f}s")
+    safe_print(f"● Hybrid total time: {total_time:.2f}s")
+    print_speedup(baseline, total_time)
+
+    # Merge per-role results from every rank
+    merged = {role: Counter() for role in ROLES}
+    for counters in gathered_counters:
+        for role in ROLES:
+            merged[role].update(counters[role])
+    if vocab is not None:
+        merged = {role: vocab.decode(total_counts[i], merged[role]) for i, role in enumerate(ROLES)}
+
+    total_counter = Counter()
+    for role in ROLES:
+        total_counter.update(merged[role])
+    return merged["positive"], merged["negative"], total_counter
+
+# ---------- Main Function ----------
+
+def main():
+    parser = argparse.ArgumentParser(description="Hybrid MPI + multiprocessing NLP pipeline")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="python",
+                        help="word-count backend used by the pool workers")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT,
+                        help="number of reviews to stream")
+    parser.add_argument("--baseline", type=float, default=None,
+                        help="sequential time in seconds to print a speedup against")
+    parser.add_argument("--encoded", action="store_true",
+                        help="move counts as NumPy arrays over a shared vocabulary")
+    parser.add_argument("--vocab-file", default=None,
+                        help="vocabulary file for --encoded; default: seed from the first 5,000 rows")
+    parser.add_argument("--dynamic", action="store_true",
+                        help="master/worker task queue: idle ranks pull the next sentiment-tagged task")
+    parser.add_argument("--task-size", type=int, default=250,
+                        help="reviews per task with --dynamic")
+    parser.add_argument("--profile", default=None, metavar="PREFIX",
+                        help="write a resource trace per rank to PREFIX.rank<N>.csv / .json / .trace.json")
+    parser.add_argument("--profile-interval", type=float, default=0.5,
+                        help="seconds between resource samples with --profile")
+    args = parser.parse_args()
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+
+    data_end = None
+    if rank == 0:
+        safe_print(f"\n[Hybrid Pipeline] Starting with {size} MPI processes (PID {os.getpid()})")
+        # One raw scan for where the first --limit rows end; ranks cut their blocks from it
+        data_end = limit_offset("reviews.csv", args.limit)
+    data_end = comm.bcast(data_end, root=0)
+    ranges = byte_ranges("reviews.csv", size, end=data_end)
+
+    # Shared vocabulary is built on rank 0 and broadcast once
+    vocab = None
+    if args.encoded:
+        if rank == 0:
+            vocab = seed_vocabulary(make_tokenizer(args.backend, alpha_only=True), vocab_file=args.vocab_file)
+        vocab = comm.bcast(vocab, root=0)
+
+    comm.Barrier()
+    start_total = time.time()
+
+    workers = min(cpu_count(), 4)
+    # With --dynamic and other ranks to serve, rank 0 only dispatches and needs no pool
+    use_pool = not (args.dynamic and rank == 0 and size > 1)
+    profiler = profiler_for(args.profile, args.profile_interval)
+    with profiler, profiler.span("dynamic" if args.dynamic else "static", rank=rank, workers=workers if use_pool else 0):
+        pool = Pool(processes=workers, initializer=init_worker, initargs=(args.backend, vocab)) if use_pool else nullcontext()
+        with pool as p:
+            if args.dynamic:
+                result = run_dynamic(comm, p, workers, vocab, ranges, data_end, args.task_size, start_total, args.baseline)
+            else:
+                result = run_static(comm, p, workers, vocab, ranges, data_end, start_total, args.baseline)
+    if args.profile:
+        profiler.save(f"{args.profile}.rank{rank}")
+
+    # ---------- Master Output ----------
+    if rank == 0 and result is not None:
+        pos_counter, neg_counter, total_counter = result
 
         # Display top words
         safe_print("\nTop Positive Words:")
-        for w, c in pos_counter.most_common(10):
+        for w, c in top_words(pos_counter, 10):
             safe_print(f"  {w}: {c}")
         safe_print("\nTop Negative Words:")
-        for w, c in neg_counter.most_common(10):
+        for w, c in top_words(neg_counter, 10):
             safe_print(f"  {w}: {c}")
 
         safe_print("\nTop Overall Words:")
-        for w, c in total_counter.most_common(15):
+        for w, c in top_words(total_counter, 15):
             safe_print(f"  {w}: {c}")
 
         # Save outputs
-        pd.DataFrame(total_counter.most_common(20), columns=["word", "frequency"]).to_csv("hybrid_output_top20.csv", index=False)
+        pd.DataFrame(top_words(total_counter, 20), columns=["word", "frequency"]).to_csv("hybrid_output_top20.csv", index=False)
         safe_print("\nResults saved to hybrid_output_top20.csv\n")
 
 
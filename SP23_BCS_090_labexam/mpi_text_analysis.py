@@ -2,91 +2,331 @@
 """
 Distributed Text Analysis using MPI (25 Marks)
 ----------------------------------------------
-1. Rank 0 (Master): loads dataset, splits into chunks, sends to workers
-2. Workers: receive chunk, clean text, count words, send result back
+1. Rank 0 (Master): streams dataset in batches, splits each batch, sends to workers
+2. Workers: receive chunk per batch, clean text, count words, send result back
 3. Master: merges all counts and reports total distributed time
+
+--sharded: each rank reads its own byte range of reviews.csv, so rank 0
+never loads or scatters review text.
+--backend vectorized: ranks count with pandas column ops.
+--encoded: ranks encode counts over a shared vocabulary and rank 0 receives
+them through comm.Reduce(MPI.SUM) on NumPy buffers instead of pickled Counters.
+--buffers: uppercase buffer collectives end to end. Each batch is sent as
+UTF-8 bytes with comm.Scatterv, count arrays are combined with comm.Reduce
+(MPI's log-depth tree) and overflow Counters with a binomial tree of
+point-to-point merges. Implies --encoded. Scatter/compute/reduce times are
+reported per phase.
+--topk-approx: ranks keep bounded heavy-hitter sketches; rank 0 merges them,
+broadcasts the candidate words and an exact second pass counts only those.
+It replaces the shared-vocabulary counts, so it can't be combined with
+--encoded; with --buffers only the Scatterv input is used.
 """
 
 from mpi4py import MPI
-import pandas as pd
-import string
+import argparse
 from collections import Counter
-from nltk.corpus import stopwords
-import nltk
+from functools import partial
+import numpy as np
 import time
+from review_reader import DEFAULT_LIMIT, iter_review_batches, iter_range_batches, byte_ranges, limit_offset, split_into_n
+from text_tokenizer import BACKENDS, make_tokenizer
+from vocab_counts import Vocabulary, seed_vocabulary
+from heavy_hitters import HeavyHitters, CandidateCounter, certified_top
 
-# Download stopwords silently (only needed once)
-nltk.download('stopwords', quiet=True)
-stop_words = set(stopwords.words('english'))
-
-def clean_text(text):
-    """Lowercase, remove punctuation, remove stopwords."""
-    text = text.lower()
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    words = [w for w in text.split() if w not in stop_words]
-    return words
-
-def process_reviews(reviews):
-    """Return word frequency Counter for a list of reviews."""
-    local_counter = Counter()
-    for review in reviews:
-        if isinstance(review, str):
-            local_counter.update(clean_text(review))
-    return local_counter
-
-def main():
-    comm = MPI.COMM_WORLD
+def count_streamed(comm, tokenizer, local_counter=None, limit=DEFAULT_LIMIT):
+    """Rank 0 streams batches and scatters one slice of each to every rank."""
     rank = comm.Get_rank()
     size = comm.Get_size()
-    start_time = time.time()
 
-    # --- Rank 0: read data and distribute ---
     if rank == 0:
-        print(f"\nRunning with {size} MPI processes...\n")
-        df = pd.read_csv("reviews.csv", delimiter="\t" if "\t" in open("reviews.csv").readline() else ",").head(20000)
-        reviews = df["Text"].tolist()
+        batches = iter_review_batches("reviews.csv", limit=limit, batch_size=size * 1000)
+
+    if local_counter is None:
+        local_counter = Counter()
+    processed = 0
+    scatter_time = compute_time = 0.0
+
+    while True:
+        scatter_start = time.time()
+        if rank == 0:
+            batch = next(batches, None)
+            # None for every rank tells the workers the stream is finished
+            chunks = split_into_n(batch, size) if batch is not None else [None] * size
+        else:
+            chunks = None
 
-        # Split dataset into equal chunks
-        chunk_size = len(reviews) // size
-        chunks = [reviews[i:i + chunk_size] for i in range(0, len(reviews), chunk_size)]
+        # --- Scatter this batch to all ranks ---
+        data_chunk = comm.scatter(chunks, root=0)
+        local_start = time.time()
+        scatter_time += local_start - scatter_start
+        if data_chunk is None:
+            break
 
-        # Ensure last chunk gets any leftover rows
-        while len(chunks) < size:
-            chunks.append([])
+        # --- Each rank processes its chunk ---
+        tokenizer.count_batch(data_chunk, local_counter)
+        compute_time += time.time() - local_start
+        processed += len(data_chunk)
 
+    return local_counter, processed, scatter_time, compute_time
+
+# Separator for packed review text; NUL never occurs in the reviews
+TEXT_SEP = "\x00"
+
+def scatter_text_bytes(comm, parts):
+    """
+    Scatterv one batch as UTF-8 bytes. parts (rank 0 only) holds one list of
+    reviews per rank, or None to signal the end of the stream.
+    Returns (texts, number of reviews) on every rank, or (None, 0) at the end.
+    """
+    rank = comm.Get_rank()
+    sizes = sendbuf = None
+    if rank == 0:
+        if parts is None:
+            sizes = np.full((comm.Get_size(), 2), -1, dtype=np.int64)
+        else:
+            payloads = [TEXT_SEP.join(t for t in part if isinstance(t, str)).encode("utf-8") for part in parts]
+            sizes = np.array([[len(p), len(part)] for p, part in zip(payloads, parts)], dtype=np.int64)
+            sendbuf = np.frombuffer(b"".join(payloads), dtype=np.uint8)
+
+    # Every rank learns its byte count and review count first
+    header = np.empty(2, dtype=np.int64)
+    comm.Scatter(sizes, header, root=0)
+    nbytes, nreviews = int(header[0]), int(header[1])
+    if nbytes < 0:
+        return None, 0
+
+    recvbuf = np.empty(nbytes, dtype=np.uint8)
+    if rank == 0:
+        counts = sizes[:, 0]
+        displs = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        comm.Scatterv([sendbuf, counts, displs, MPI.BYTE], recvbuf, root=0)
     else:
-        chunks = None
+        comm.Scatterv(None, recvbuf, root=0)
 
-    # --- Scatter data to all ranks ---
-    data_chunk = comm.scatter(chunks, root=0)
+    texts = recvbuf.tobytes().decode("utf-8").split(TEXT_SEP) if nbytes else []
+    return texts, nreviews
 
-    # --- Each rank processes its chunk ---
+def count_buffered(comm, tokenizer, local_counter=None, limit=DEFAULT_LIMIT):
+    """Like count_streamed, but batches travel as raw bytes through Scatterv."""
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+
+    if rank == 0:
+        batches = iter_review_batches("reviews.csv", limit=limit, batch_size=size * 1000)
+
+    if local_counter is None:
+        local_counter = Counter()
+    processed = 0
+    scatter_time = compute_time = 0.0
+
+    while True:
+        t0 = time.time()
+        if rank == 0:
+            batch = next(batches, None)
+            parts = split_into_n(batch, size) if batch is not None else None
+        else:
+            parts = None
+        texts, n = scatter_text_bytes(comm, parts)
+        t1 = time.time()
+        scatter_time += t1 - t0
+        if texts is None:
+            break
+
+        tokenizer.count_batch(texts, local_counter)
+        compute_time += time.time() - t1
+        processed += n
+
+    return local_counter, processed, scatter_time, compute_time
+
+def count_sharded(comm, tokenizer, local_counter=None, limit=DEFAULT_LIMIT):
+    """Every rank parses its own byte range; only the range end is broadcast."""
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+
+    data_end = limit_offset("reviews.csv", limit) if rank == 0 else None
+    data_end = comm.bcast(data_end, root=0)
+    path, start, end = byte_ranges("reviews.csv", size, end=data_end)[rank]
+
+    if local_counter is None:
+        local_counter = Counter()
+    processed = 0
     local_start = time.time()
-    local_counter = process_reviews(data_chunk)
-    local_time = time.time() - local_start
-    print(f"Rank {rank} processed {len(data_chunk)} lines in {local_time:.2f}s")
+    for batch in iter_range_batches(path, start, end):
+        tokenizer.count_batch(batch, local_counter)
+        processed += len(batch)
+    compute_time = time.time() - local_start
+
+    # Nothing is scattered in this mode
+    return local_counter, processed, 0.0, compute_time
 
-    # --- Gather results back at root ---
+def reduce_counters(comm, local_counter):
+    """Pickle every Counter to rank 0 and merge them there."""
     gathered_counters = comm.gather(local_counter, root=0)
+    if comm.Get_rank() != 0:
+        return None
+    total_counter = Counter()
+    for c in gathered_counters:
+        total_counter.update(c)
+    return total_counter
 
-    # --- Master combines all results ---
+def tree_reduce_counter(comm, counter, tag=11):
+    """
+    Binomial-tree merge: in round k, ranks with bit k set send their Counter
+    to rank - 2**k and drop out. log2(size) rounds; rank 0 ends with the total.
+    """
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    step = 1
+    while step < size:
+        if rank % (2 * step) == step:
+            comm.send(counter, dest=rank - step, tag=tag)
+            return None
+        if rank + step < size:
+            counter.update(comm.recv(source=rank + step, tag=tag))
+        step *= 2
+    return counter
+
+def reduce_encoded(comm, local_counter, vocab, tree=False):
+    """
+    Sum count arrays with MPI.SUM; only the small overflow Counters are pickled
+    (gathered at rank 0, or merged up a binomial tree with tree=True).
+    """
+    rank = comm.Get_rank()
+    counts, overflow = vocab.encode(local_counter)
+    total = vocab.zeros() if rank == 0 else None
+    comm.Reduce(counts, total, op=MPI.SUM, root=0)
+    if tree:
+        merged = tree_reduce_counter(comm, overflow)
+    else:
+        overflows = comm.gather(overflow, root=0)
+        merged = Counter()
+        for o in overflows or []:
+            merged.update(o)
+    if rank != 0:
+        return None
+    return vocab.decode(total, merged)
+
+def report_phases(comm, scatter_time, compute_time, reduce_time):
+    """Print min/mean/max of each phase across ranks (rank 0)."""
+    local = np.array([scatter_time, compute_time, reduce_time], dtype=np.float64)
+    table = np.empty((comm.Get_size(), 3), dtype=np.float64) if comm.Get_rank() == 0 else None
+    comm.Gather(local, table, root=0)
+    if comm.Get_rank() == 0:
+        print("\nPhase timings across ranks (min / mean / max):")
+        for i, phase in enumerate(("scatter", "compute", "reduce")):
+            col = table[:, i]
+            print(f"  {phase:<8} {col.min():.3f}s / {col.mean():.3f}s / {col.max():.3f}s")
+
+def approximate_counts(comm, count_input, tokenizer, capacity):
+    """
+    Pass 1: every rank fills a bounded sketch; rank 0 merges them.
+    Pass 2: exact counts for the broadcast candidates, reduced as arrays.
+    Returns (exact candidate counts on rank 0, error bound, processed, scatter, compute).
+    """
+    rank = comm.Get_rank()
+
+    sketch, processed, scatter_time, compute_time = count_input(comm, tokenizer, HeavyHitters(capacity))
+    sketches = comm.gather(sketch, root=0)
+    candidates = error_bound = None
     if rank == 0:
-        total_counter = Counter()
-        for c in gathered_counters:
-            total_counter.update(c)
+        merged = HeavyHitters(capacity)
+        for part in sketches:
+            merged.merge(part)
+        candidates, error_bound = sorted(merged.candidates()), merged.error_bound
+    candidates = comm.bcast(candidates, root=0)
+
+    exact, _, scatter_2, compute_2 = count_input(comm, tokenizer, CandidateCounter(candidates))
+    total_counter = reduce_encoded(comm, exact, Vocabulary(candidates), tree=True)
+    return total_counter, error_bound, processed, scatter_time + scatter_2, compute_time + compute_2
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Distributed word frequency analysis")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT,
+                        help="number of reviews to process")
+    parser.add_argument("--baseline", type=float, default=None,
+                        help="sequential time in seconds (seq_text_analysis.py) to print a speedup against")
+    parser.add_argument("--sharded", action="store_true",
+                        help="each rank reads its own byte range of reviews.csv")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="python",
+                        help="word-count backend used on every rank")
+    parser.add_argument("--encoded", action="store_true",
+                        help="reduce NumPy count arrays over a shared vocabulary")
+    parser.add_argument("--vocab-file", default=None,
+                        help="vocabulary file for --encoded; default: seed from the first 5,000 rows")
+    parser.add_argument("--buffers", action="store_true",
+                        help="Scatterv text bytes + Reduce count arrays + tree-merged overflow (implies --encoded)")
+    parser.add_argument("--topk-approx", action="store_true",
+                        help="gather heavy-hitter sketches and verify candidates exactly instead of full Counters")
+    parser.add_argument("--sketch-size", type=int, default=2000,
+                        help="words kept per sketch for --topk-approx")
+    args = parser.parse_args()
+    if args.topk_approx and args.encoded:
+        parser.error("--topk-approx sends sketches instead of count arrays; it can't be combined with --encoded")
+    return args
 
+def main():
+    args = parse_args()
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    # Stopwords and punctuation table are built once per rank
+    tokenizer = make_tokenizer(args.backend)
+
+    # Shared vocabulary is built on rank 0 and broadcast once (--topk-approx never uses it)
+    vocab = None
+    if (args.encoded or args.buffers) and not args.topk_approx:
+        vocab = seed_vocabulary(tokenizer, vocab_file=args.vocab_file) if rank == 0 else None
+        vocab = comm.bcast(vocab, root=0)
+
+    start_time = time.time()
+
+    if rank == 0:
+        mode = "sharded" if args.sharded else "buffered" if args.buffers else "streamed"
+        print(f"\nRunning with {size} MPI processes ({mode} input)...\n")
+        if vocab is not None:
+            print(f"Shared vocabulary: {len(vocab)} words\n")
+
+    count_input = count_sharded if args.sharded else count_buffered if args.buffers else count_streamed
+    count_input = partial(count_input, limit=args.limit)
+
+    if args.topk_approx:
+        # Sketch merge, candidate broadcast and the final Reduce form the reduce phase
+        reduce_start = time.time()
+        total_counter, error_bound, processed, scatter_time, local_time = approximate_counts(
+            comm, count_input, tokenizer, args.sketch_size)
+        reduce_time = time.time() - reduce_start - scatter_time - local_time
+    else:
+        local_counter, processed, scatter_time, local_time = count_input(comm, tokenizer)
+
+        # --- Combine all results at root ---
+        reduce_start = time.time()
+        if vocab is not None:
+            total_counter = reduce_encoded(comm, local_counter, vocab, tree=args.buffers)
+        else:
+            total_counter = reduce_counters(comm, local_counter)
+        reduce_time = time.time() - reduce_start
+    print(f"Rank {rank} processed {processed} lines in {local_time:.2f}s")
+
+    if args.buffers or args.topk_approx:
+        report_phases(comm, scatter_time, local_time, reduce_time)
+
+    if rank == 0:
         total_time = time.time() - start_time
 
         # Print performance summary
         print(f"\nTotal distributed time: {total_time:.2f}s")
 
-        sequential_time = 8.70  
-        speedup = sequential_time / total_time
-        print(f"Speedup over sequential: {speedup:.2f}x\n")
+        if args.baseline:
+            print(f"Speedup over sequential: {args.baseline / total_time:.2f}x\n")
+        else:
+            print("Speedup over sequential: pass --baseline or use benchmark_suite.py\n")
 
         # Print top 20 words
+        top_words, certified = certified_top(total_counter, 20, error_bound if args.topk_approx else 0)
         print("Top 20 most frequent words:")
-        for word, count in total_counter.most_common(20):
+        if args.topk_approx:
+            print(f"(sketch error bound {error_bound}, exact top-20 {'certified' if certified else 'NOT certified - raise --sketch-size'})")
+        for word, count in top_words:
             print(f"{word}: {count}")
 
 if __name__ == "__main__":
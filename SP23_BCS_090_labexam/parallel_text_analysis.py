@@ -2,90 +2,240 @@
 """
 Parallel Text Processing using Multiprocessing (25 Marks)
 ---------------------------------------------------------
-1. Splits dataset into chunks (per worker)
+1. Streams the dataset in small batches (several per worker)
 2. Each worker cleans text and counts words
-3. Merges all local results (reduction)
-4. Runs for 1, 2, 4, 8 workers and reports performance
+3. Merges local results as they arrive (reduction)
+4. Runs for 1, 2, 4, 8 workers (--workers) and reports performance
+   (printed only; benchmark_suite.py collects runs into benchmark_results.csv)
+
+--sharded: workers get byte ranges of reviews.csv and parse their own rows,
+so no review text is pickled through the parent process.
+--backend vectorized: workers count with pandas column ops.
+--encoded: workers return NumPy count arrays over a shared vocabulary,
+so the reduction is an array sum instead of pickled Counters.
+--topk-approx: workers return bounded heavy-hitter sketches, then an exact
+second pass counts only the candidate words (gather traffic is O(sketch size)).
+It replaces the count arrays, so it can't be combined with --encoded.
+--warm: each pool is spawned (and every worker initialised) before its timer
+starts; spawn cost is reported separately and --repeat runs reuse the pool.
+--chunksize / --unordered / --batches-per-worker tune how tasks are handed out.
+--profile PREFIX samples per-core CPU / memory / IO of the parent and its
+workers, one stage per worker count (resource_profiler.py).
 """
 
-import pandas as pd
+import argparse
 import time
-import string
 from collections import Counter
-from multiprocessing import Pool
-from nltk.corpus import stopwords
-import nltk
-
-# Download stopwords if not already present
-nltk.download('stopwords', quiet=True)
-stop_words = set(stopwords.words('english'))
-
-# --- Function for cleaning text ---
-def clean_text(text):
-    text = text.lower()
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    words = text.split()
-    words = [w for w in words if w not in stop_words]
-    return words
+from functools import partial
+from multiprocessing import Pool, Semaphore
+from heavy_hitters import HeavyHitters, CandidateCounter, certified_top
+from resource_profiler import profiler_for
+from review_reader import DEFAULT_LIMIT, iter_review_batches, iter_range_batches, byte_ranges, limit_offset
+from text_tokenizer import BACKENDS, make_tokenizer
+from vocab_counts import merge_encoded, seed_vocabulary
+
+# Built once per worker process by init_worker (Pool initializer)
+tokenizer = None
+vocab = None
+
+def init_worker(backend, shared_vocab=None, ready=None):
+    global tokenizer, vocab
+    tokenizer = make_tokenizer(backend)
+    vocab = shared_vocab
+    if ready is not None:
+        ready.release()
+
+def spawn_pool(workers, backend, shared_vocab):
+    """Start a pool and wait until all workers have run init_worker."""
+    start = time.time()
+    # Every worker releases once at the end of init_worker; no task round trip
+    ready = Semaphore(0)
+    pool = Pool(processes=workers, initializer=init_worker, initargs=(backend, shared_vocab, ready))
+    for _ in range(workers):
+        ready.acquire()
+    return pool, time.time() - start
+
+def finish_counts(local_counter):
+    """Counter, or (count array, overflow) when a vocabulary is shared."""
+    return vocab.encode(local_counter) if vocab is not None else local_counter
 
 # --- Function executed by each worker ---
 def process_chunk(text_list):
+    return finish_counts(tokenizer.count_batch(text_list))
+
+# --- Sharded mode: worker parses only its own slice of the file ---
+def process_range(byte_range):
     local_counter = Counter()
-    for review in text_list:
-        if isinstance(review, str):
-            local_counter.update(clean_text(review))
-    return local_counter
+    for batch in task_batches(byte_range):
+        tokenizer.count_batch(batch, local_counter)
+    return finish_counts(local_counter)
+
+def task_batches(task):
+    """
+    A task is a list of reviews, or in sharded mode a (path, start, end, data_end)
+    byte range; data_end is the limit offset every range of the split was cut
+    with, so no worker reads rows past --limit when aligning its last record.
+    """
+    if isinstance(task, tuple):
+        path, start, end, data_end = task
+        return iter_range_batches(path, start, end, data_end=data_end)
+    return [task]
+
+# --- Approximate top-K: bounded sketch first, exact counts for candidates second ---
+def sketch_task(task, capacity):
+    sketch = HeavyHitters(capacity)
+    for batch in task_batches(task):
+        tokenizer.count_batch(batch, sketch)
+    return sketch
+
+def verify_task(task, candidates):
+    local_counter = CandidateCounter(candidates)
+    for batch in task_batches(task):
+        tokenizer.count_batch(batch, local_counter)
+    return local_counter.to_counter()
+
+def approximate_counts(imap, make_tasks, capacity):
+    """Two passes over the tasks; returns (exact candidate counts, error bound)."""
+    sketch = HeavyHitters(capacity)
+    for part in imap(partial(sketch_task, capacity=capacity), make_tasks()):
+        sketch.merge(part)
+
+    candidates = sketch.candidates()
+    exact_counter = Counter()
+    for c in imap(partial(verify_task, candidates=candidates), make_tasks()):
+        exact_counter.update(c)
+    return exact_counter, sketch.error_bound
+
+def count_words(imap, make_tasks, args, shared_vocab):
+    """One full pass over the tasks; returns (global counter, error bound)."""
+    if args.topk_approx:
+        return approximate_counts(imap, make_tasks, args.sketch_size)
+
+    # Reduction step: combine local results batch by batch
+    process = process_range if args.sharded else process_chunk
+    local_counters = imap(process, make_tasks())
+    if shared_vocab is not None:
+        # Array sum; words outside the vocabulary come back in small overflow Counters
+        return shared_vocab.decode(*merge_encoded(shared_vocab, local_counters)), 0
+    global_counter = Counter()
+    for c in local_counters:
+        global_counter.update(c)
+    return global_counter, 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parallel word frequency analysis")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT,
+                        help="number of reviews to process")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="worker counts to run; speedup is relative to the first")
+    parser.add_argument("--sharded", action="store_true",
+                        help="give each worker a byte range of reviews.csv instead of review lists")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="python",
+                        help="word-count backend used by the workers")
+    parser.add_argument("--encoded", action="store_true",
+                        help="return NumPy count arrays over a shared vocabulary instead of Counters")
+    parser.add_argument("--vocab-file", default=None,
+                        help="vocabulary file (one word per line) for --encoded; default: seed from the first 5,000 rows")
+    parser.add_argument("--topk-approx", action="store_true",
+                        help="gather heavy-hitter sketches and verify candidates exactly instead of full Counters")
+    parser.add_argument("--sketch-size", type=int, default=2000,
+                        help="words kept per sketch for --topk-approx")
+    parser.add_argument("--warm", action="store_true",
+                        help="spawn and initialise each pool before timing; report spawn cost separately")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="timed runs per worker count (best is reported); with --warm they reuse the pool")
+    parser.add_argument("--chunksize", type=int, default=1,
+                        help="tasks handed to a worker at a time (Pool.imap chunksize)")
+    parser.add_argument("--unordered", action="store_true",
+                        help="merge results as they finish (imap_unordered); ties in the top-20 may reorder")
+    parser.add_argument("--batches-per-worker", type=int, default=4,
+                        help="tasks per worker for each run")
+    parser.add_argument("--profile", default=None, metavar="PREFIX",
+                        help="write a resource trace to PREFIX.csv / .json / .trace.json")
+    parser.add_argument("--profile-interval", type=float, default=0.5,
+                        help="seconds between resource samples with --profile")
+    args = parser.parse_args()
+    if args.topk_approx and args.encoded:
+        parser.error("--topk-approx sends sketches instead of count arrays; it can't be combined with --encoded")
+    return args
 
 # --- Main Program ---
 def main():
-    # Step 1: Load dataset
-    df = pd.read_csv("reviews.csv", delimiter="\t" if "\t" in open("reviews.csv").readline() else ",").head(20000)
-    reviews = df["Text"].tolist()
-
-    # Step 2: Define worker counts to test
-    workers_list = [1, 2, 4, 8]
-    baseline_time = None
-
-    results_table = []
-
-    for workers in workers_list:
-        # Split data into roughly equal chunks
-        chunk_size = len(reviews) // workers
-        chunks = [reviews[i:i + chunk_size] for i in range(0, len(reviews), chunk_size)]
-
-        start_time = time.time()
+    args = parse_args()
 
-        with Pool(processes=workers) as pool:
-            local_counters = pool.map(process_chunk, chunks)
+    # Step 1: Dataset is streamed per run, so only a few batches are in memory
+    review_limit = args.limit
+    if args.sharded:
+        # One scan to find where the first --limit rows end
+        data_end = limit_offset("reviews.csv", review_limit)
 
-        # Reduction step: combine all local Counters
-        global_counter = Counter()
-        for c in local_counters:
-            global_counter.update(c)
+    shared_vocab = None
+    if args.encoded:
+        shared_vocab = seed_vocabulary(make_tokenizer(args.backend), vocab_file=args.vocab_file)
+        print(f"Shared vocabulary: {len(shared_vocab)} words")
 
-        total_time = time.time() - start_time
-
-        # Baseline timing (1 worker)
-        if workers == 1:
-            baseline_time = total_time
-
-        speedup = baseline_time / total_time
-        efficiency = (speedup / workers) * 100
-
-        results_table.append((workers, total_time, speedup, efficiency))
-
-        # Print progress
-        print(f"{workers} workers -> Time: {total_time:.2f}s | Speedup: {speedup:.2f}x | Efficiency: {efficiency:.1f}%")
+    # Step 2: Define worker counts to test
+    workers_list = args.workers
+    baseline_time = None
 
-    # Save results to CSV
-    df_results = pd.DataFrame(results_table, columns=["Workers", "Time (s)", "Speedup", "Efficiency (%)"])
-    df_results.to_csv("parallel_output.csv", index=False)
+    profiler = profiler_for(args.profile, args.profile_interval, percpu=True)
+    with profiler:
+        for workers in workers_list:
+            # A few batches per worker keeps every process busy
+            n_tasks = workers * args.batches_per_worker
+            batch_size = max(1, review_limit // n_tasks)
+
+            def make_tasks():
+                if args.sharded:
+                    return [r + (data_end,) for r in byte_ranges("reviews.csv", n_tasks, end=data_end)]
+                return iter_review_batches("reviews.csv", limit=review_limit, batch_size=batch_size)
+
+            def run(pool):
+                imap = pool.imap_unordered if args.unordered else pool.imap
+                return count_words(partial(imap, chunksize=args.chunksize), make_tasks, args, shared_vocab)
+
+            total_time = float("inf")
+            with profiler.span(f"{workers} workers", workers=workers, tasks=n_tasks):
+                if args.warm:
+                    # Spawn + init outside the timer; every repeat reuses the warm pool
+                    pool, spawn_time = spawn_pool(workers, args.backend, shared_vocab)
+                    with pool:
+                        for _ in range(args.repeat):
+                            start_time = time.time()
+                            global_counter, error_bound = run(pool)
+                            total_time = min(total_time, time.time() - start_time)
+                else:
+                    for _ in range(args.repeat):
+                        start_time = time.time()
+                        with Pool(processes=workers, initializer=init_worker, initargs=(args.backend, shared_vocab)) as pool:
+                            global_counter, error_bound = run(pool)
+                        total_time = min(total_time, time.time() - start_time)
+
+            # Baseline timing (first worker count, normally 1)
+            if baseline_time is None:
+                baseline_time = total_time
+
+            speedup = baseline_time / total_time
+            efficiency = (speedup / (workers / workers_list[0])) * 100
+
+            # Print progress
+            if args.warm:
+                print(f"{workers} workers -> Time: {total_time:.2f}s | Speedup: {speedup:.2f}x | "
+                      f"Efficiency: {efficiency:.1f}% | Spawn: {spawn_time:.2f}s")
+            else:
+                print(f"{workers} workers -> Time: {total_time:.2f}s | Speedup: {speedup:.2f}x | Efficiency: {efficiency:.1f}%")
 
     # Print top 20 words (just once for the final global counter)
-    top_words = global_counter.most_common(20)
+    top_words, certified = certified_top(global_counter, 20, error_bound)
     print("\nTop 20 Words:")
+    if args.topk_approx:
+        print(f"(sketch error bound {error_bound}, exact top-20 {'certified' if certified else 'NOT certified - raise --sketch-size'})")
     for w, c in top_words:
         print(f"{w}: {c}")
 
+    profiler.print_summary()
+    for path in profiler.save(args.profile):
+        print(f"Profile written to {path}")
+
 if __name__ == "__main__":
     main()
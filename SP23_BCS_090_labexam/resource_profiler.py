@@ -0,0 +1,315 @@
+# resource_profiler.py
+"""
+Resource Profiler
+-----------------
+One sampler for every stage (the notebook's extraction, balancing, split and
+training cells and the labexam scripts) instead of a monitor thread per cell.
+
+    profiler = ResourceProfiler(interval=0.5)
+    with profiler:
+        with profiler.span("count"):
+            ...
+    profiler.save("seq_profile")  # seq_profile.csv / .json / .trace.json
+
+1. A daemon thread wakes every `interval` seconds and reads psutil counters
+   only (no nvidia-smi or other subprocesses): CPU % (optionally per core),
+   RSS of this process and its children, their read / write bytes and the
+   system-wide disk read / write bytes since start
+2. span(name) / @profiler.profile() / record() mark when each stage starts
+   and ends
+3. save() writes the samples as CSV, samples + spans as JSON, and both as a
+   Chrome trace (chrome://tracing or ui.perfetto.dev: stages as slices,
+   samples as counter tracks)
+
+The sampler's own CPU time is kept in overhead_s, so a run can show what
+the measuring cost.
+"""
+
+import csv
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 1024.0 * 1024.0
+
+
+class ResourceProfiler:
+    """Samples resource counters on a background thread and records stage spans."""
+
+    def __init__(self, interval=0.5, percpu=False, children=True):
+        if psutil is None:
+            raise ImportError("ResourceProfiler needs psutil (pip install psutil)")
+        self.interval = interval
+        self.percpu = percpu
+        self.children = children
+        self.samples = []
+        self.spans = []
+        self.overhead_s = 0.0
+        self._process = psutil.Process()
+        self._t0 = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._io0 = self._disk0 = None
+
+    # --- Sampling ---
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._io0 = self._process_io()
+        self._disk0 = self._disk_io()
+        # cpu_percent compares with the previous call; this one sets the reference
+        psutil.cpu_percent(percpu=self.percpu)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="resource-profiler")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return self
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        # Closing sample, so a stage shorter than one interval still has a data point
+        self._sample()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        cpu_start = time.thread_time()
+        while not self._stop.wait(self.interval):
+            self._sample()
+        self.overhead_s += time.thread_time() - cpu_start
+
+    def _processes(self):
+        processes = [self._process]
+        if self.children:
+            try:
+                processes += self._process.children(recursive=True)
+            except psutil.Error:
+                pass
+        return processes
+
+    def _process_io(self):
+        """(rss, read bytes, write bytes) summed over this process and its live children"""
+        rss = read = write = 0
+        for p in self._processes():
+            try:
+                with p.oneshot():
+                    rss += p.memory_info().rss
+                    # io_counters does not exist on macOS
+                    io = p.io_counters() if hasattr(p, "io_counters") else None
+            except psutil.Error:
+                # A pool worker exited between listing and reading
+                continue
+            if io is not None:
+                read += io.read_bytes
+                write += io.write_bytes
+        return rss, read, write
+
+    @staticmethod
+    def _disk_io():
+        try:
+            disk = psutil.disk_io_counters()
+        except (OSError, RuntimeError):
+            disk = None
+        return (disk.read_bytes, disk.write_bytes) if disk is not None else (0, 0)
+
+    def _sample(self):
+        now = time.perf_counter() - self._t0
+        cpu = psutil.cpu_percent(percpu=self.percpu)
+        rss, read, write = self._process_io()
+        disk_read, disk_write = self._disk_io()
+        sample = {
+            "time_s": round(now, 3),
+            "cpu_percent": round(sum(cpu) / len(cpu), 1) if self.percpu else cpu,
+            "rss_mb": round(rss / MB, 1),
+            "io_read_mb": round((read - self._io0[1]) / MB, 2),
+            "io_write_mb": round((write - self._io0[2]) / MB, 2),
+            "disk_read_mb": round((disk_read - self._disk0[0]) / MB, 2),
+            "disk_write_mb": round((disk_write - self._disk0[1]) / MB, 2),
+        }
+        if self.percpu:
+            sample["cores"] = cpu
+        self.samples.append(sample)
+
+    # --- Stages ---
+    @contextmanager
+    def span(self, name, **args):
+        """Record `name` from entry to exit; keyword args are stored with it."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), **args)
+
+    def record(self, name, start, end, **args):
+        """Stage with time.perf_counter() bounds, for callbacks that see begin / end separately."""
+        self.spans.append({
+            "name": name,
+            "start_s": round(start - self._t0, 6),
+            "duration_s": round(end - start, 6),
+            "thread": threading.current_thread().name,
+            "tid": threading.get_ident(),
+            "args": args,
+        })
+
+    def profile(self, name=None):
+        """Decorator form of span(); the stage is named after the function by default."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*a, **kw):
+                with self.span(name or fn.__name__):
+                    return fn(*a, **kw)
+            return wrapper
+        return decorate
+
+    def summary(self):
+        """Per stage: duration, mean / peak CPU % and peak RSS of the samples inside it."""
+        rows = []
+        for span in self.spans:
+            end = span["start_s"] + span["duration_s"]
+            inside = [s for s in self.samples if span["start_s"] <= s["time_s"] <= end]
+            rows.append({
+                "stage": span["name"],
+                "duration_s": round(span["duration_s"], 3),
+                "cpu_mean": round(sum(s["cpu_percent"] for s in inside) / len(inside), 1) if inside else None,
+                "cpu_peak": max((s["cpu_percent"] for s in inside), default=None),
+                "rss_peak_mb": max((s["rss_mb"] for s in inside), default=None),
+            })
+        return rows
+
+    def print_summary(self):
+        for row in self.summary():
+            cpu = f"CPU {row['cpu_mean']:.0f}% (peak {row['cpu_peak']:.0f}%)" if row["cpu_mean"] is not None else "no samples"
+            rss = f", RSS peak {row['rss_peak_mb']:.0f} MB" if row["rss_peak_mb"] is not None else ""
+            print(f"[profile] {row['stage']}: {row['duration_s']:.2f}s | {cpu}{rss}")
+        print(f"[profile] {len(self.samples)} samples every {self.interval}s, "
+              f"sampler CPU {self.overhead_s * 1000:.0f} ms")
+
+    # --- Output ---
+    def to_csv(self, path):
+        fields = ["time_s", "cpu_percent", "rss_mb", "io_read_mb", "io_write_mb", "disk_read_mb", "disk_write_mb"]
+        cores = len(self.samples[0]["cores"]) if self.samples and "cores" in self.samples[0] else 0
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(fields + [f"core_{i}" for i in range(cores)])
+            for s in self.samples:
+                writer.writerow([s[name] for name in fields] + list(s.get("cores", [])))
+        return path
+
+    def to_json(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "pid": os.getpid(),
+                "interval_s": self.interval,
+                "overhead_s": round(self.overhead_s, 4),
+                "spans": self.spans,
+                "summary": self.summary(),
+                "samples": self.samples,
+            }, f)
+        return path
+
+    def to_chrome_trace(self, path):
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "resource profiler"}}]
+        for span in self.spans:
+            events.append({
+                "name": span["name"], "cat": "stage", "ph": "X", "pid": pid, "tid": span["tid"],
+                "ts": span["start_s"] * 1e6, "dur": span["duration_s"] * 1e6, "args": span["args"],
+            })
+        for s in self.samples:
+            ts = s["time_s"] * 1e6
+            events.append({"name": "CPU %", "ph": "C", "pid": pid, "ts": ts, "args": {"cpu": s["cpu_percent"]}})
+            events.append({"name": "RSS MB", "ph": "C", "pid": pid, "ts": ts, "args": {"rss": s["rss_mb"]}})
+            events.append({"name": "Process IO MB", "ph": "C", "pid": pid, "ts": ts,
+                           "args": {"read": s["io_read_mb"], "write": s["io_write_mb"]}})
+            events.append({"name": "Disk IO MB", "ph": "C", "pid": pid, "ts": ts,
+                           "args": {"read": s["disk_read_mb"], "write": s["disk_write_mb"]}})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+    def save(self, prefix):
+        """<prefix>.csv, <prefix>.json and <prefix>.trace.json; returns the paths"""
+        return [self.to_csv(prefix + ".csv"), self.to_json(prefix + ".json"),
+                self.to_chrome_trace(prefix + ".trace.json")]
+
+    def plot(self, path=None, title="Resource Usage"):
+        """CPU (per core when sampled) and RSS over time, stages shaded; returns the figure"""
+        import matplotlib.pyplot as plt
+
+        times = [s["time_s"] for s in self.samples]
+        fig, (ax_cpu, ax_mem) = plt.subplots(2, 1, figsize=(12, 7), sharex=True)
+        if self.samples and "cores" in self.samples[0]:
+            for i, core in enumerate(zip(*(s["cores"] for s in self.samples))):
+                ax_cpu.plot(times, core, label=f"CPU Core {i}", alpha=0.4, linewidth=1)
+        ax_cpu.plot(times, [s["cpu_percent"] for s in self.samples], label="CPU Average", color="black", linewidth=2)
+        ax_mem.plot(times, [s["rss_mb"] for s in self.samples], label="RSS (MB)", color="purple", linewidth=2)
+        for i, span in enumerate(self.spans):
+            for ax in (ax_cpu, ax_mem):
+                ax.axvspan(span["start_s"], span["start_s"] + span["duration_s"],
+                           color=f"C{i % 10}", alpha=0.08, label=span["name"] if ax is ax_cpu else None)
+
+        ax_cpu.set_title(title)
+        ax_cpu.set_ylabel("Utilization (%)")
+        ax_cpu.set_ylim(0, 105)
+        ax_mem.set_xlabel("Time (seconds)")
+        ax_mem.set_ylabel("Memory (MB)")
+        for ax in (ax_cpu, ax_mem):
+            ax.legend(loc="upper right", fontsize="small")
+            ax.grid(True, alpha=0.3)
+        fig.tight_layout()
+        if path:
+            fig.savefig(path)
+            print(f"Graph saved to: {path}")
+        return fig
+
+
+class NullProfiler:
+    """Stand-in when profiling is off: same calls, nothing sampled or written."""
+
+    def start(self):
+        return self
+
+    def stop(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def span(self, name, **args):
+        return nullcontext()
+
+    def record(self, name, start, end, **args):
+        pass
+
+    def profile(self, name=None):
+        return lambda fn: fn
+
+    def print_summary(self):
+        pass
+
+    def save(self, prefix):
+        return []
+
+
+def profiler_for(prefix, interval=0.5, percpu=False):
+    """ResourceProfiler when an output prefix is given (e.g. --profile), else NullProfiler"""
+    return ResourceProfiler(interval, percpu) if prefix else NullProfiler()
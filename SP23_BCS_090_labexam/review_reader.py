@@ -0,0 +1,299 @@
+# review_reader.py
+"""
+Streaming Review Reader
+-----------------------
+Shared loader for the text-analysis scripts.
+
+1. Opens reviews.csv once and detects the delimiter from the header line
+2. Parses only the Text (and optionally Score) columns in bounded batches
+3. Stops reading as soon as the row limit is reached
+4. Can split the file into byte ranges so each worker parses only its own slice
+
+Memory stays proportional to one batch, not to the size of the file.
+"""
+
+import csv
+import io
+import os
+import pandas as pd
+
+DEFAULT_PATH = "reviews.csv"
+DEFAULT_LIMIT = 20000
+DEFAULT_BATCH_SIZE = 2000
+
+
+def detect_delimiter(header_line):
+    """Tab-separated dumps and plain CSV are both in use."""
+    return "\t" if "\t" in header_line else ","
+
+
+def split_into_n(lst, n):
+    """Split a list into n nearly equal parts"""
+    k, m = divmod(len(lst), n)
+    return [lst[i*k + min(i, m):(i+1)*k + min(i+1, m)] for i in range(n)]
+
+
+def _chunk_reader(handle, sep, batch_size, limit, columns):
+    wanted = {c.lower() for c in columns}
+    options = dict(
+        delimiter=sep,
+        chunksize=batch_size,
+        nrows=limit,
+        usecols=lambda c: c.strip().lower() in wanted,
+    )
+    try:
+        return pd.read_csv(handle, on_bad_lines="skip", **options)
+    except TypeError:
+        # Older pandas without on_bad_lines
+        return pd.read_csv(handle, engine="python", **options)
+
+
+def _resolve_column(chunk, name, path):
+    for c in chunk.columns:
+        if c.strip().lower() == name:
+            return c
+    raise ValueError(f"No '{name.capitalize()}' column found in {path}")
+
+
+def iter_review_batches(path=DEFAULT_PATH, limit=DEFAULT_LIMIT,
+                        batch_size=DEFAULT_BATCH_SIZE, with_scores=False):
+    """
+    Yield lists of review texts, at most batch_size per list.
+    With with_scores=True, yield (texts, scores) where each score is a
+    float or None when missing.
+    """
+    columns = ("text", "score") if with_scores else ("text",)
+
+    with open(path, encoding="utf-8", newline="") as f:
+        sep = detect_delimiter(f.readline())
+        f.seek(0)
+
+        reader = _chunk_reader(f, sep, batch_size, limit, columns)
+        text_col = score_col = None
+        remaining = limit
+        try:
+            for chunk in reader:
+                if remaining is not None:
+                    if remaining <= 0:
+                        break
+                    chunk = chunk.iloc[:remaining]
+                    remaining -= len(chunk)
+
+                if text_col is None:
+                    text_col = _resolve_column(chunk, "text", path)
+                    if with_scores:
+                        score_col = _resolve_column(chunk, "score", path)
+
+                texts = chunk[text_col].tolist()
+                if with_scores:
+                    scores = pd.to_numeric(chunk[score_col], errors="coerce")
+                    yield texts, [float(s) if pd.notna(s) else None for s in scores]
+                else:
+                    yield texts
+        finally:
+            reader.close()
+
+
+# ---------- Byte-range sharding ----------
+
+def _read_header(f):
+    """Return (separator, column names, offset of the first data row)."""
+    f.seek(0)
+    line = f.readline()
+    text = line.decode("utf-8-sig")
+    sep = detect_delimiter(text)
+    names = next(csv.reader([text], delimiter=sep))
+    return sep, [n.strip() for n in names], len(line)
+
+
+def _read_record(f):
+    """Read one physical record, following quoted fields across newlines."""
+    record = f.readline()
+    while record and record.count(b'"') % 2:
+        more = f.readline()
+        if not more:
+            break
+        record += more
+    return record
+
+
+def _is_record(raw, sep, n_fields):
+    try:
+        rows = list(csv.reader(io.StringIO(raw.decode("utf-8", "replace"), newline=""), delimiter=sep))
+    except csv.Error:
+        return False
+    return len(rows) == 1 and len(rows[0]) == n_fields
+
+
+def _records_follow(f, sep, n_fields, file_end, lookahead=4):
+    for _ in range(lookahead):
+        if f.tell() >= file_end:
+            return True
+        record = _read_record(f)
+        if not record:
+            return True
+        # file_end is a record boundary, so a real record never runs past it
+        if f.tell() > file_end or not _is_record(record, sep, n_fields):
+            return False
+    return True
+
+
+def _align(f, offset, sep, n_fields, data_start, file_end):
+    """
+    Move offset forward to the start of the next record.
+    A line start only counts as a boundary if the next few records parsed
+    from it all have the header's field count, so newlines inside quoted
+    text are skipped.
+    Every worker uses this same rule for both ends of its range, so
+    neighbouring ranges always agree on where one stops and the next starts.
+    Nothing at or past file_end is read, so bytes after it (e.g. a row
+    still being appended) never move a boundary.
+    """
+    if offset <= data_start:
+        return data_start
+    if offset >= file_end:
+        return file_end
+
+    f.seek(offset - 1)
+    f.readline()
+    while True:
+        pos = f.tell()
+        if pos >= file_end:
+            return file_end
+        if _records_follow(f, sep, n_fields, file_end):
+            return pos
+        f.seek(pos)
+        f.readline()
+
+
+def limit_offset(path=DEFAULT_PATH, limit=DEFAULT_LIMIT):
+    """Byte offset just past the first `limit` data rows (scans raw lines only)."""
+    with open(path, "rb") as f:
+        _, _, pos = _read_header(f)
+        f.seek(pos)
+        for _ in range(limit):
+            record = _read_record(f)
+            if not record:
+                break
+            pos += len(record)
+    return pos
+
+
+def complete_offset(path=DEFAULT_PATH, start=None):
+    """
+    Byte offset just past the last complete record at or after start (default:
+    the first data row). A row still being appended (no closing newline or
+    an open quote) is left for the next reader.
+    """
+    with open(path, "rb") as f:
+        _, _, data_start = _read_header(f)
+        pos = data_start if start is None else max(start, data_start)
+        f.seek(pos)
+        while True:
+            record = _read_record(f)
+            if not record.endswith(b"\n") or record.count(b'"') % 2:
+                return pos
+            pos += len(record)
+
+
+def byte_ranges(path=DEFAULT_PATH, n=1, limit=None, end=None, start=None):
+    """
+    Split the data section of the file into n (path, start, end) byte ranges.
+    Ranges are cut at raw offsets; workers align them to record boundaries.
+    Pass end (from limit_offset) to reuse one scan across several splits,
+    and start (a record boundary) to split only the rows after it.
+    """
+    with open(path, "rb") as f:
+        _, _, data_start = _read_header(f)
+    if start is not None:
+        data_start = max(start, data_start)
+    if end is not None:
+        file_end = end
+    elif limit is not None:
+        file_end = limit_offset(path, limit)
+    else:
+        file_end = os.path.getsize(path)
+
+    k, m = divmod(max(file_end - data_start, 0), n)
+    bounds = [data_start + i*k + min(i, m) for i in range(n + 1)]
+    return [(path, bounds[i], bounds[i + 1]) for i in range(n)]
+
+
+class _RangeReader(io.RawIOBase):
+    """Read-only view of bytes [start, end) of an open binary file."""
+
+    def __init__(self, f, start, end):
+        self._f = f
+        self._remaining = end - start
+        f.seek(start)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        n = min(len(buf), self._remaining)
+        if n <= 0:
+            return 0
+        data = self._f.read(n)
+        buf[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+
+def align_range(path, start, end, data_end=None):
+    """
+    Record boundaries (lo, hi) that [start, end) is read as.
+    data_end (a complete_offset / limit_offset result) is treated as the end
+    of the file; every range of one split must pass the same value.
+    """
+    with open(path, "rb") as f:
+        sep, names, data_start = _read_header(f)
+        file_end = os.path.getsize(path) if data_end is None else data_end
+        return (_align(f, start, sep, len(names), data_start, file_end),
+                _align(f, min(end, file_end), sep, len(names), data_start, file_end))
+
+
+def iter_range_batches(path, start, end, batch_size=DEFAULT_BATCH_SIZE, with_scores=False, data_end=None):
+    """
+    Yield batches (same shape as iter_review_batches) for the records that
+    begin inside [start, end). Only this slice of the file is parsed.
+    With data_end, nothing past it is read (see align_range).
+    """
+    wanted = ("text", "score") if with_scores else ("text",)
+
+    lo, hi = align_range(path, start, end, data_end)
+    with open(path, "rb") as f:
+        sep, names, _ = _read_header(f)
+        if hi <= lo:
+            return
+
+        lowered = [n.lower() for n in names]
+        for name in wanted:
+            if name not in lowered:
+                raise ValueError(f"No '{name.capitalize()}' column found in {path}")
+        usecols = [lowered.index(name) for name in wanted]
+
+        options = dict(
+            delimiter=sep,
+            header=None,
+            names=lowered,
+            usecols=usecols,
+            encoding="utf-8",
+            chunksize=batch_size,
+        )
+        handle = io.BufferedReader(_RangeReader(f, lo, hi))
+        try:
+            reader = pd.read_csv(handle, on_bad_lines="skip", **options)
+        except TypeError:
+            reader = pd.read_csv(handle, engine="python", **options)
+
+        try:
+            for chunk in reader:
+                texts = chunk["text"].tolist()
+                if with_scores:
+                    scores = pd.to_numeric(chunk["score"], errors="coerce")
+                    yield texts, [float(s) if pd.notna(s) else None for s in scores]
+                else:
+                    yield texts
+        finally:
+            reader.close()
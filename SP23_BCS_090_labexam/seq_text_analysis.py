@@ -6,57 +6,66 @@ Dataset columns: ProductId, UserId, ProfileName, HelpfulnessNumerator,
 HelpfulnessDenominator, Score, Time, Summary, Text
 
 Steps:
-1. Load first 20,000 reviews
+1. Stream the first 20,000 reviews in batches (--limit)
 2. Clean text (lowercase, remove punctuation, stopwords)
 3. Count word frequency using collections.Counter
 4. Save top 20 words to seq_output.csv
 5. Print total processing time
+
+--backend vectorized counts each batch with pandas column ops instead.
+--profile PREFIX samples CPU / memory / IO per stage (resource_profiler.py).
 """
 
+import argparse
 import pandas as pd
 import time
-import string
 from collections import Counter
-from nltk.corpus import stopwords
-import nltk
+from resource_profiler import profiler_for
+from review_reader import DEFAULT_LIMIT, iter_review_batches
+from text_tokenizer import BACKENDS, make_tokenizer
 
-# Download stopwords (only first time)
-nltk.download('stopwords', quiet=True)
+def main():
+    parser = argparse.ArgumentParser(description="Sequential word frequency analysis")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="python",
+                        help="word-count backend")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT,
+                        help="number of reviews to process")
+    parser.add_argument("--profile", default=None, metavar="PREFIX",
+                        help="write a resource trace to PREFIX.csv / .json / .trace.json")
+    parser.add_argument("--profile-interval", type=float, default=0.5,
+                        help="seconds between resource samples with --profile")
+    args = parser.parse_args()
 
-def clean_text(text):
-    """Lowercase, remove punctuation, remove stopwords."""
-    stop_words = set(stopwords.words('english'))
-    text = text.lower()
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    words = text.split()
-    words = [w for w in words if w not in stop_words]
-    return words
+    # Stopwords and punctuation table are built once, not per review
+    tokenizer = make_tokenizer(args.backend)
 
-def main():
+    profiler = profiler_for(args.profile, args.profile_interval)
     start_time = time.time()
 
-    # Step 1: Load dataset (first 20,000 reviews)
-    df = pd.read_csv("reviews.csv", delimiter="\t" if "\t" in open("reviews.csv").readline() else ",").head(20000)
-    
-    # Step 2: Extract words
-    all_words = []
-    for review in df['Text']:
-        if isinstance(review, str):
-            all_words.extend(clean_text(review))
-
-    # Step 3: Count word frequencies
-    word_counts = Counter(all_words)
+    with profiler:
+        # Step 1 + 2 + 3: Stream the first --limit reviews and count batch by batch
+        word_counts = Counter()
+        total_reviews = 0
+        with profiler.span("count"):
+            for batch in iter_review_batches("reviews.csv", limit=args.limit):
+                total_reviews += len(batch)
+                tokenizer.count_batch(batch, word_counts)
 
-    # Step 4: Top 20 most frequent words
-    top_words = word_counts.most_common(20)
+        # Step 4: Top 20 most frequent words
+        with profiler.span("top20"):
+            top_words = word_counts.most_common(20)
 
-    # Step 5: Write to CSV
-    pd.DataFrame(top_words, columns=["word", "frequency"]).to_csv("seq_output.csv", index=False)
+        # Step 5: Write to CSV
+        with profiler.span("write"):
+            pd.DataFrame(top_words, columns=["word", "frequency"]).to_csv("seq_output.csv", index=False)
 
     # Step 6: Print timing + summary
     total_time = time.time() - start_time
-    print(f"Processed {len(df)} reviews in {total_time:.2f} seconds.")
+    print(f"Processed {total_reviews} reviews in {total_time:.2f} seconds.")
     print("Top words:", ", ".join([f"{w}({c})" for w, c in top_words]))
+    profiler.print_summary()
+    for path in profiler.save(args.profile):
+        print(f"Profile written to {path}")
 
 if __name__ == "__main__":
     main()
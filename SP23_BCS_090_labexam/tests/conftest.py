@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# The scripts import their helpers as top-level modules (python seq_text_analysis.py ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEADER = "Id,Score,Summary,Text\n"
+
+
+@pytest.fixture
+def reviews_csv(tmp_path):
+    """Write rows (already formatted CSV lines) under the reviews.csv header; returns the path."""
+    path = tmp_path / "reviews.csv"
+
+    def write(*rows, mode="w"):
+        with open(path, mode, encoding="utf-8", newline="") as f:
+            if mode == "w":
+                f.write(HEADER)
+            f.write("".join(rows))
+        return str(path)
+
+    return write
+
+
+@pytest.fixture
+def small_stopwords(monkeypatch):
+    """Tokenizers without the NLTK download"""
+    import text_tokenizer
+    monkeypatch.setattr(text_tokenizer, "load_stopwords", lambda: frozenset({"the", "a", "is"}))
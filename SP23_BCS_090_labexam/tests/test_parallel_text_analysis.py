@@ -0,0 +1,26 @@
+from collections import Counter
+
+import parallel_text_analysis
+from review_reader import byte_ranges, limit_offset
+
+
+def row(i, text):
+    return f'{i},5,s,"{text}"\n'
+
+
+def sharded_counts(path, limit, n):
+    data_end = limit_offset(path, limit)
+    parallel_text_analysis.init_worker("python")
+    total = Counter()
+    for r in byte_ranges(path, n, end=data_end):
+        total.update(parallel_text_analysis.process_range(r + (data_end,)))
+    return total
+
+
+def test_sharded_ranges_stop_at_limit(reviews_csv, small_stopwords):
+    # Rows past --limit that don't look like records (e.g. an export cut short)
+    # must not pull the last range's boundary past the limit
+    path = reviews_csv(*[row(i, "apple pear") for i in range(6)],
+                       row(6, "zebra"), "truncated line\n", row(7, "zebra"))
+    for n in (1, 2, 4):
+        assert sharded_counts(path, 6, n) == Counter({"apple": 6, "pear": 6})
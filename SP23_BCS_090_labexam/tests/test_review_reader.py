@@ -0,0 +1,62 @@
+import pytest
+
+from review_reader import (align_range, byte_ranges, complete_offset, iter_range_batches, iter_review_batches,
+                           limit_offset)
+
+
+def multiline_rows(n):
+    """Rows whose quoted Text holds newlines, commas, quotes and lines that look like rows"""
+    rows = []
+    for i in range(n):
+        if i % 3 == 0:
+            text = f'line one of {i}\n{i},5,s,looks like a row\nand ""quoted"", end'
+        elif i % 3 == 1:
+            text = f"plain {i}, with a comma"
+        else:
+            text = f"two\n\nblank lines {i}"
+        rows.append(f'{i},{i % 5 + 1},s,"{text}"\n')
+    return rows
+
+
+def all_texts(path, limit=None):
+    return [t for batch in iter_review_batches(path, limit=limit, batch_size=7) for t in batch]
+
+
+def range_texts(ranges, **kw):
+    return [t for r in ranges for batch in iter_range_batches(*r, batch_size=5, **kw) for t in batch]
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 8, 13, 40])
+def test_ranges_cover_every_row_once(reviews_csv, n):
+    path = reviews_csv(*multiline_rows(30))
+    expected = all_texts(path)
+    assert len(expected) == 30 and "\n" in expected[0]
+    assert range_texts(byte_ranges(path, n)) == expected
+
+
+@pytest.mark.parametrize("n", [1, 3, 7])
+def test_ranges_stop_at_the_row_limit(reviews_csv, n):
+    path = reviews_csv(*multiline_rows(30))
+    end = limit_offset(path, 11)
+    assert range_texts(byte_ranges(path, n, end=end), data_end=end) == all_texts(path, limit=11)
+    assert range_texts(byte_ranges(path, n, limit=11), data_end=end) == all_texts(path, limit=11)
+
+
+def test_neighbouring_ranges_share_boundaries(reviews_csv):
+    path = reviews_csv(*multiline_rows(20))
+    ranges = byte_ranges(path, 6)
+    aligned = [align_range(*r) for r in ranges]
+    for (_, hi), (lo, _) in zip(aligned, aligned[1:]):
+        assert hi == lo
+
+
+def test_complete_offset_skips_a_row_still_being_written(reviews_csv):
+    rows = multiline_rows(4)
+    path = reviews_csv(*rows)
+    size = len("".join(rows).encode()) + len("Id,Score,Summary,Text\n")
+    assert complete_offset(path) == size
+
+    reviews_csv('99,5,s,"open quote\nstill going', mode="a")
+    assert complete_offset(path) == size
+    assert range_texts(byte_ranges(path, 3, end=size), data_end=size) == all_texts(path, limit=4)
+
@@ -0,0 +1,57 @@
+import pytest
+
+from word_index import WordIndex, update
+
+
+def row(i, score, text):
+    return f'{i},{score},s,"{text}"\n'
+
+
+def counts(db):
+    return dict(((w, b), n) for w, b, n in db.conn.execute("SELECT word, bucket, count FROM counts"))
+
+
+def test_append_counts_only_new_rows(tmp_path, reviews_csv, small_stopwords):
+    path = reviews_csv(row(1, 5, "great apple"), row(2, 1, "bad apple"))
+    with WordIndex(str(tmp_path / "index.sqlite")) as db:
+        assert update(db, path)[0] == 2
+        reviews_csv(row(3, 5, "great pear"), mode="a")
+        assert update(db, path)[0] == 1
+        assert update(db, path)[0] == 0
+        assert counts(db) == {("great", 5): 2, ("apple", 5): 1, ("apple", 1): 1, ("bad", 1): 1, ("pear", 5): 1}
+        assert db.top(1, "positive") == [("great", 2)]
+
+
+def test_partial_tail_row_is_left_for_next_update(tmp_path, reviews_csv, small_stopwords):
+    path = reviews_csv(row(1, 5, "great apple"))
+    with WordIndex(str(tmp_path / "index.sqlite")) as db:
+        update(db, path)
+        # Two complete rows, then a row still being written
+        reviews_csv(row(9001, 4, "zebra"), row(9002, 2, "yak"), "9003,PX", mode="a")
+        assert update(db, path)[0] == 2
+        assert counts(db)[("zebra", 4)] == 1 and counts(db)[("yak", 2)] == 1
+
+        reviews_csv(',s,"moose"\n', mode="a")
+        assert update(db, path)[0] == 1
+        assert db.reviews() == 4
+        assert int(db.state()["offset"]) == len(open(path, "rb").read())
+
+
+def test_multiline_rows_split_across_workers(tmp_path, reviews_csv, small_stopwords):
+    rows = [row(i, 5, f"word{i % 3}\nnext line\n" if i % 2 else "plain text") for i in range(200)]
+    path = reviews_csv(*rows)
+    with WordIndex(str(tmp_path / "serial.sqlite")) as serial, WordIndex(str(tmp_path / "pool.sqlite")) as pooled:
+        assert update(serial, path)[0] == 200
+        assert update(pooled, path, workers=3)[0] == 200
+        assert counts(serial) == counts(pooled)
+
+
+def test_rewritten_file_needs_rebuild(tmp_path, reviews_csv, small_stopwords):
+    path = reviews_csv(row(1, 5, "great apple"))
+    with WordIndex(str(tmp_path / "index.sqlite")) as db:
+        update(db, path)
+        reviews_csv(row(1, 5, "other words"))
+        with pytest.raises(SystemExit):
+            update(db, path)
+        assert update(db, path, rebuild=True)[0] == 1
+        assert ("other", 5) in counts(db)
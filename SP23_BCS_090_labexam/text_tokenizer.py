@@ -0,0 +1,106 @@
+# text_tokenizer.py
+"""
+Shared Tokenizer Engine
+-----------------------
+Used by all text-analysis scripts in place of the per-review clean_text.
+
+1. Builds the punctuation translation table and stopword frozenset once
+2. Tokenizes a whole batch of reviews per call (one lower/translate/split)
+3. Counts tokens straight into the caller's Counter, no per-review lists
+
+Two backends share the same count_batch API (see make_tokenizer):
+- python:     joined-batch str ops + Counter.update
+- vectorized: pandas column string ops, one isin mask, integer-coded counts
+"""
+
+import string
+from collections import Counter
+from itertools import filterfalse
+import numpy as np
+import pandas as pd
+from nltk.corpus import stopwords
+import nltk
+
+PUNCT_TABLE = str.maketrans('', '', string.punctuation)
+
+
+def load_stopwords():
+    """English NLTK stopwords (downloaded silently the first time)."""
+    nltk.download('stopwords', quiet=True)
+    return frozenset(stopwords.words('english'))
+
+
+class Tokenizer:
+    """
+    Lowercase, remove punctuation, remove stopwords.
+    alpha_only=True also drops tokens with digits (hybrid pipeline rule).
+    """
+
+    def __init__(self, stop_words=None, alpha_only=False):
+        self.stop_words = frozenset(load_stopwords() if stop_words is None else stop_words)
+        self.alpha_only = alpha_only
+
+    def tokens(self, texts):
+        """Iterator over the kept tokens of every string in texts."""
+        # Joining first is safe: tokens never span the separating space
+        joined = " ".join(t for t in texts if isinstance(t, str))
+        words = joined.lower().translate(PUNCT_TABLE).split()
+        kept = filterfalse(self.stop_words.__contains__, words)
+        if self.alpha_only:
+            kept = filter(str.isalpha, kept)
+        return kept
+
+    def count_batch(self, texts, counter=None):
+        """Add token counts for a batch of texts to counter and return it."""
+        if counter is None:
+            counter = Counter()
+        counter.update(self.tokens(texts))
+        return counter
+
+
+class VectorizedTokenizer(Tokenizer):
+    """
+    Column-at-a-time backend: the batch is a pandas Series, tokens are
+    exploded into one column, stopwords removed with a single isin mask and
+    counted with np.bincount over pd.factorize codes.
+    """
+
+    def __init__(self, stop_words=None, alpha_only=False):
+        super().__init__(stop_words, alpha_only)
+        self._stop_array = np.array(sorted(self.stop_words), dtype=object)
+
+    def tokens(self, texts):
+        """Series of the kept tokens, in order of appearance."""
+        col = pd.Series(texts, dtype=object).dropna()
+        if col.empty:
+            return col
+        # Any other non-string value becomes NaN here and is dropped after explode
+        words = col.str.lower().str.translate(PUNCT_TABLE).str.split().explode().dropna()
+        words = words[~words.isin(self._stop_array)]
+        if self.alpha_only:
+            words = words[words.str.isalpha()]
+        return words
+
+    def count_batch(self, texts, counter=None):
+        if counter is None:
+            counter = Counter()
+        codes, uniques = pd.factorize(self.tokens(texts))
+        if len(uniques):
+            counts = np.bincount(codes, minlength=len(uniques))
+            # factorize keeps first-appearance order, so most_common ties
+            # come out in the same order as the python backend
+            counter.update(dict(zip(uniques.tolist(), counts.tolist())))
+        return counter
+
+
+BACKENDS = {
+    "python": Tokenizer,
+    "vectorized": VectorizedTokenizer,
+}
+
+
+def make_tokenizer(backend="python", alpha_only=False):
+    """Build the tokenizer for a backend name from BACKENDS."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', choose from {sorted(BACKENDS)}")
+    return BACKENDS[backend](alpha_only=alpha_only)
@@ -0,0 +1,102 @@
+# vocab_counts.py
+"""
+Integer Vocabulary Encoding
+---------------------------
+Shared word -> id dictionary so workers return fixed-size NumPy count
+arrays instead of string-keyed Counters.
+
+1. Master builds the vocabulary once from a seed sample (or loads a file)
+2. Every worker receives it once (Pool initializer / MPI bcast)
+3. Workers encode their local counts into an int64 array of len(vocab);
+   words missing from the vocabulary go to a small overflow Counter
+4. Merging is an array sum (or MPI Reduce with MPI.SUM on the buffers)
+
+Counts stay exact: the overflow Counter carries everything the array can't.
+"""
+
+from collections import Counter
+import numpy as np
+from review_reader import iter_review_batches
+
+COUNT_DTYPE = np.int64
+
+
+class Vocabulary:
+    """Fixed word <-> id mapping; ids follow the order words were added."""
+
+    def __init__(self, words=()):
+        self.words = list(words)
+        self.index = {w: i for i, w in enumerate(self.words)}
+
+    def __len__(self):
+        return len(self.words)
+
+    @classmethod
+    def from_counter(cls, counter, max_size=None):
+        """
+        Vocabulary from a seed Counter. Insertion (first-appearance) order is
+        kept so decoded most_common ties match the plain Counter path.
+        """
+        words = list(counter)
+        if max_size is not None and len(words) > max_size:
+            keep = {w for w, _ in counter.most_common(max_size)}
+            words = [w for w in words if w in keep]
+        return cls(words)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(line.rstrip("\n") for line in f if line.strip())
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for w in self.words:
+                f.write(w + "\n")
+
+    def zeros(self):
+        return np.zeros(len(self.words), dtype=COUNT_DTYPE)
+
+    def encode(self, counter):
+        """Counter -> (count array, overflow Counter of unknown words)."""
+        counts = self.zeros()
+        overflow = Counter()
+        index = self.index
+        for word, c in counter.items():
+            i = index.get(word)
+            if i is None:
+                overflow[word] = c
+            else:
+                counts[i] = c
+        return counts, overflow
+
+    def decode(self, counts, overflow=None):
+        """(count array, overflow) -> Counter with zero entries dropped."""
+        nonzero = np.flatnonzero(counts)
+        counter = Counter(dict(zip([self.words[i] for i in nonzero], counts[nonzero].tolist())))
+        if overflow:
+            counter.update(overflow)
+        return counter
+
+
+def merge_encoded(vocab, results):
+    """Sum (counts, overflow) pairs from several workers."""
+    total = vocab.zeros()
+    overflow = Counter()
+    for counts, extra in results:
+        total += counts
+        overflow.update(extra)
+    return total, overflow
+
+
+def seed_vocabulary(tokenizer, path="reviews.csv", seed_rows=5000, vocab_file=None):
+    """
+    Vocabulary from the first seed_rows reviews (or from vocab_file).
+    The seed is a prefix of the stream, so decoded tie order is unchanged.
+    """
+    if vocab_file:
+        return Vocabulary.load(vocab_file)
+
+    counter = Counter()
+    for batch in iter_review_batches(path, limit=seed_rows):
+        tokenizer.count_batch(batch, counter)
+    return Vocabulary.from_counter(counter)
@@ -0,0 +1,249 @@
+# word_index.py
+"""
+Incremental Word-Count Index
+----------------------------
+Persistent per-word, per-score counts for reviews.csv, so a refresh after
+new reviews were appended only reads the new rows.
+
+1. SQLite file (reviews_index.sqlite): one row per (word, score bucket) and
+   a small state table with the byte offset just past the last counted row
+2. update: counts the complete rows after that offset (all worker ranges in
+   parallel with --workers), then adds them to the stored counts and moves
+   the offset in the same transaction, so an interrupted run changes nothing
+3. top: top words overall / positive / negative straight from the index,
+   written in the same word,frequency layout as hybrid_output_top20.csv
+
+Buckets are the review score 1-5 (0 = missing), so positive (4-5), negative
+(1-2) and all reviews are the same splits the hybrid pipeline uses.
+Appending is the only supported change: if the file is shorter than the
+stored offset or the last 4 KB before it differ (file rewritten or
+truncated), update asks for --rebuild.
+
+    python word_index.py update            # first run counts everything
+    python word_index.py update            # later runs: appended rows only
+    python word_index.py top --bucket positive -n 10
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+from collections import Counter
+from functools import partial
+from multiprocessing import Pool
+import pandas as pd
+from review_reader import DEFAULT_PATH, align_range, byte_ranges, complete_offset, iter_range_batches, limit_offset
+from text_tokenizer import BACKENDS, make_tokenizer
+
+DEFAULT_DB = "reviews_index.sqlite"
+BUCKETS = {
+    "all": (0, 1, 2, 3, 4, 5),
+    "positive": (4, 5),
+    "negative": (1, 2),
+    "neutral": (3,),
+}
+# Bytes before the offset that must be unchanged for an update to append
+CHECK_BYTES = 4096
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counts (
+    word TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (word, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS reviews (
+    bucket INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Built once per pool worker by init_worker
+TOKENIZER = None
+
+
+def init_worker(backend):
+    global TOKENIZER
+    TOKENIZER = make_tokenizer(backend, alpha_only=True)
+
+
+def score_bucket(score):
+    return int(score) if score is not None and 1 <= score <= 5 else 0
+
+
+def count_range(byte_range, data_end):
+    """
+    Count one byte range -> ({bucket: Counter}, {bucket: reviews}, end offset
+    of the last row read). Nothing past data_end is read.
+    """
+    path, start, end = byte_range
+    counts, reviews = {}, Counter()
+    _, consumed = align_range(path, start, end, data_end)
+    for texts, scores in iter_range_batches(path, start, end, with_scores=True, data_end=data_end):
+        grouped = {}
+        for text, score in zip(texts, scores):
+            grouped.setdefault(score_bucket(score), []).append(str(text))
+        for bucket, group in grouped.items():
+            TOKENIZER.count_batch(group, counts.setdefault(bucket, Counter()))
+            reviews[bucket] += len(group)
+    return counts, reviews, consumed
+
+
+def region_hash(path, end):
+    """Hash of the CHECK_BYTES bytes before end (header included when the file is short)"""
+    with open(path, "rb") as f:
+        f.seek(max(end - CHECK_BYTES, 0))
+        return hashlib.sha1(f.read(end - max(end - CHECK_BYTES, 0))).hexdigest()
+
+
+class WordIndex:
+    """SQLite-backed (word, score bucket) -> count store with the last counted offset."""
+
+    def __init__(self, db_path=DEFAULT_DB):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def state(self):
+        return dict(self.conn.execute("SELECT key, value FROM state"))
+
+    def clear(self):
+        with self.conn:
+            for table in ("counts", "reviews", "state"):
+                self.conn.execute(f"DELETE FROM {table}")
+
+    def resume_offset(self, path, backend):
+        """Offset to continue from, or None when the stored state doesn't match the file."""
+        state = self.state()
+        if not state:
+            return 0
+        if state["backend"] != backend:
+            return None
+        offset = int(state["offset"])
+        if os.path.getsize(path) < offset or region_hash(path, offset) != state["hash"]:
+            return None
+        return offset
+
+    def merge(self, counts, reviews, path, offset, backend):
+        """Add counts and move the offset in one transaction."""
+        rows = ((word, bucket, n) for bucket, counter in counts.items() for word, n in counter.items())
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO counts (word, bucket, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (word, bucket) DO UPDATE SET count = count + excluded.count", rows)
+            self.conn.executemany(
+                "INSERT INTO reviews (bucket, count) VALUES (?, ?) "
+                "ON CONFLICT (bucket) DO UPDATE SET count = count + excluded.count", reviews.items())
+            state = {"path": os.path.abspath(path), "offset": offset, "hash": region_hash(path, offset),
+                     "backend": backend, "updated": time.strftime("%Y-%m-%d %H:%M:%S")}
+            self.conn.executemany("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                                  [(k, str(v)) for k, v in state.items()])
+
+    def top(self, n=20, bucket="all"):
+        marks = ",".join("?" * len(BUCKETS[bucket]))
+        return self.conn.execute(
+            f"SELECT word, SUM(count) AS total FROM counts WHERE bucket IN ({marks}) "
+            f"GROUP BY word ORDER BY total DESC, word LIMIT ?", (*BUCKETS[bucket], n)).fetchall()
+
+    def reviews(self, bucket="all"):
+        marks = ",".join("?" * len(BUCKETS[bucket]))
+        return self.conn.execute(f"SELECT COALESCE(SUM(count), 0) FROM reviews WHERE bucket IN ({marks})",
+                                 BUCKETS[bucket]).fetchone()[0]
+
+
+def update(index, path, backend="python", workers=1, rebuild=False, limit=None):
+    """Count the rows appended since the last update; returns (new reviews, seconds)."""
+    start_time = time.time()
+    start = None if rebuild else index.resume_offset(path, backend)
+    if start is None:
+        if not rebuild:
+            raise SystemExit(f"{path} changed before the last counted row (or --backend differs); "
+                             f"run again with --rebuild")
+        index.clear()
+        start = 0
+
+    # Rows the first update counts can be capped like the other scripts (--limit)
+    end = limit_offset(path, limit) if limit and start == 0 else complete_offset(path, start or None)
+    if start and end <= start:
+        return 0, time.time() - start_time
+
+    ranges = byte_ranges(path, max(workers, 1), end=end, start=start or None)
+    task = partial(count_range, data_end=end)
+    counts, reviews = {}, Counter()
+    offset = start
+    if workers > 1:
+        with Pool(processes=workers, initializer=init_worker, initargs=(backend,)) as pool:
+            results = pool.map(task, ranges)
+    else:
+        init_worker(backend)
+        results = map(task, ranges)
+    for part_counts, part_reviews, consumed in results:
+        for bucket, counter in part_counts.items():
+            counts.setdefault(bucket, Counter()).update(counter)
+        reviews.update(part_reviews)
+        offset = max(offset, consumed)
+
+    # The offset moves only past rows that were read, never to `end` blindly
+    if start and offset <= start:
+        return 0, time.time() - start_time
+    index.merge(counts, reviews, path, offset, backend)
+    return sum(reviews.values()), time.time() - start_time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Incremental word-count index for reviews.csv")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite index file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    up = commands.add_parser("update", help="count rows appended since the last update")
+    up.add_argument("--path", default=DEFAULT_PATH, help="reviews file")
+    up.add_argument("--backend", choices=sorted(BACKENDS), default="python",
+                    help="word-count backend (changing it needs --rebuild)")
+    up.add_argument("--workers", type=int, default=1,
+                    help="processes counting byte ranges of the new rows")
+    up.add_argument("--rebuild", action="store_true",
+                    help="drop the stored counts and count the whole file again")
+    up.add_argument("--limit", type=int, default=None,
+                    help="on a first / rebuild run, count only the first N rows")
+
+    top = commands.add_parser("top", help="print (and optionally save) the top words")
+    top.add_argument("--bucket", choices=sorted(BUCKETS), default="all")
+    top.add_argument("-n", type=int, default=20)
+    top.add_argument("--out", default=None, help="CSV file (word,frequency), e.g. hybrid_output_top20.csv")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with WordIndex(args.db) as index:
+        if args.command == "update":
+            new_reviews, total_time = update(index, args.path, args.backend, args.workers, args.rebuild, args.limit)
+            state = index.state()
+            print(f"Counted {new_reviews} new reviews in {total_time:.2f} seconds "
+                  f"({index.reviews()} indexed, offset {state.get('offset', 0)}).")
+        else:
+            top_words = index.top(args.n, args.bucket)
+            print(f"Top {args.bucket} words ({index.reviews(args.bucket)} reviews):")
+            for w, c in top_words:
+                print(f"  {w}: {c}")
+            if args.out:
+                pd.DataFrame(top_words, columns=["word", "frequency"]).to_csv(args.out, index=False)
+                print(f"Saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()